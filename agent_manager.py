@@ -6,14 +6,32 @@ Manages Claude Code, Gemini Browser, and Agent Zero agents
 
 import json
 import threading
+import queue
 import subprocess
 import shutil
 import os
+import time
+import atexit
+import mmap
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Set, Iterator
 import logging
 
+try:
+    import orjson
+    ORJSON_ENABLED = True
+except ImportError:
+    ORJSON_ENABLED = False
+
+
+# Registry mutations are coalesced and written to disk this long after the first change
+REGISTRY_FLUSH_DELAY = 0.2
+
+# Maximum number of agent commands executing concurrently
+MAX_AGENT_WORKERS = 4
+
 
 class AgentManager:
     """Manages multiple AI agent types with registry persistence"""
@@ -45,18 +63,35 @@ class AgentManager:
         for registry_path in self.registries.values():
             registry_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # Thread safety
-        self.registry_lock = threading.Lock()
-
-        # Load all registries
-        self.agent_data = {
-            "claude_code": self._load_registry("claude_code"),
-            "gemini": self._load_registry("gemini"),
-            "agent_zero": self._load_registry("agent_zero")
-        }
-
-        # Background threads for async agent execution
-        self.background_threads: List[threading.Thread] = []
+        # Thread safety: writers hold the lock and publish each tool's "agents"
+        # dict copy-on-write, so readers can use a snapshot without locking.
+        # Re-entrant because cleanup_expired_agents deletes while holding it.
+        self.registry_lock = threading.RLock()
+
+        # Debounced registry persistence (see _save_registry / flush)
+        self._dirty: Set[str] = set()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flush_lock = threading.Lock()
+        atexit.register(self.flush)
+
+        # Load all registries (in parallel)
+        with ThreadPoolExecutor(max_workers=len(self.registries)) as executor:
+            self.agent_data = dict(zip(
+                self.registries,
+                executor.map(self._load_registry, self.registries)
+            ))
+
+        # Reverse index: agent name -> tool (first registry wins on duplicates)
+        self._name_index: Dict[str, str] = {}
+        for tool, data in self.agent_data.items():
+            for agent_name in data["agents"]:
+                self._name_index.setdefault(agent_name, tool)
+
+        # Bounded pool of daemon workers for async agent execution (daemon, unlike
+        # ThreadPoolExecutor, so a 30 minute CLI run never blocks interpreter exit)
+        self._task_queue: queue.Queue = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._workers_lock = threading.Lock()
 
         # Find Claude CLI
         self.claude_cli_path = self._find_claude_cli()
@@ -75,48 +110,128 @@ class AgentManager:
             return {"agents": {}}
 
         try:
-            with registry_path.open("r", encoding="utf-8") as f:
-                data = json.load(f)
-                if "agents" not in data:
-                    data["agents"] = {}
-                return data
+            with registry_path.open("rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return {"agents": {}}
+                # Parse straight from the mapped file (no Python-level read copy)
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if ORJSON_ENABLED:
+                        with memoryview(mm) as view:
+                            data = orjson.loads(view)
+                    else:
+                        data = json.loads(mm[:])
+            if "agents" not in data:
+                data["agents"] = {}
+
+            # Backfill numeric expiry for agents saved before expires_ts existed
+            for metadata in data["agents"].values():
+                if "expires_ts" not in metadata and metadata.get("expires_at"):
+                    try:
+                        metadata["expires_ts"] = datetime.fromisoformat(metadata["expires_at"]).timestamp()
+                    except ValueError:
+                        self.logger.warning(f"Invalid expires_at in {tool} registry: {metadata['expires_at']}")
+            return data
         except Exception as e:
             self.logger.error(f"Failed to load {tool} registry: {e}")
             return {"agents": {}}
 
     def _save_registry(self, tool: str):
-        """Save agent registry to disk"""
+        """Mark agent registry dirty and schedule a debounced write to disk"""
+        with self.registry_lock:
+            self._dirty.add(tool)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(REGISTRY_FLUSH_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _write_registry(self, tool: str, payload: bytes):
+        """Atomically replace a registry file on disk"""
         registry_path = self.registries.get(tool)
         if not registry_path:
             return
 
+        tmp_path = registry_path.with_suffix(".json.tmp")
         try:
-            with registry_path.open("w", encoding="utf-8") as f:
-                json.dump(self.agent_data[tool], f, indent=2)
+            tmp_path.write_bytes(payload)
+            os.replace(tmp_path, registry_path)
         except Exception as e:
             self.logger.error(f"Failed to save {tool} registry: {e}")
 
+    @staticmethod
+    def _dump_registry(data: Dict[str, Any]) -> bytes:
+        """Serialize a registry to compact UTF-8 JSON"""
+        if ORJSON_ENABLED:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def flush(self):
+        """Write all dirty registries to disk now (also runs at exit)"""
+        with self._flush_lock:
+            with self.registry_lock:
+                if self._flush_timer is not None:
+                    self._flush_timer.cancel()
+                    self._flush_timer = None
+                dirty, self._dirty = self._dirty, set()
+                payloads = {
+                    tool: self._dump_registry(self.agent_data[tool])
+                    for tool in dirty
+                }
+
+            for tool, payload in payloads.items():
+                self._write_registry(tool, payload)
+
     def _register_agent(self, tool: str, agent_name: str, metadata: Dict[str, Any]):
         """Register an agent in the registry"""
         with self.registry_lock:
-            self.agent_data[tool].setdefault("agents", {})[agent_name] = metadata
+            agents = dict(self.agent_data[tool].get("agents", {}))
+            agents[agent_name] = metadata
+            self.agent_data[tool]["agents"] = agents
+            self._name_index[agent_name] = tool
             self._save_registry(tool)
 
     def _get_agent(self, agent_name: str) -> Optional[tuple[str, Dict[str, Any]]]:
-        """Get agent metadata by name (searches all registries)"""
-        with self.registry_lock:
-            for tool, data in self.agent_data.items():
-                if agent_name in data.get("agents", {}):
-                    return (tool, data["agents"][agent_name])
-        return None
+        """Get agent metadata by name (via the name index, lock-free)"""
+        tool = self._name_index.get(agent_name)
+        if tool is None:
+            return None
+        metadata = self.agent_data[tool]["agents"].get(agent_name)
+        if metadata is None:
+            return None
+        return (tool, metadata)
 
     def _delete_agent_from_registry(self, tool: str, agent_name: str):
         """Remove agent from registry"""
         with self.registry_lock:
             if agent_name in self.agent_data[tool].get("agents", {}):
-                del self.agent_data[tool]["agents"][agent_name]
+                if self._name_index.get(agent_name) == tool:
+                    del self._name_index[agent_name]
+                agents = dict(self.agent_data[tool]["agents"])
+                del agents[agent_name]
+                self.agent_data[tool]["agents"] = agents
                 self._save_registry(tool)
 
+    # ------------------------------------------------------------------ #
+    # Background Workers
+    # ------------------------------------------------------------------ #
+
+    def _submit(self, target, *args):
+        """Queue target(*args) on the background worker pool"""
+        with self._workers_lock:
+            if len(self._workers) < MAX_AGENT_WORKERS:
+                worker = threading.Thread(target=self._worker_loop, daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        self._task_queue.put((target, args))
+
+    def _worker_loop(self):
+        """Run queued agent tasks forever"""
+        while True:
+            target, args = self._task_queue.get()
+            try:
+                target(*args)
+            except Exception as e:
+                self.logger.error(f"Background agent task failed: {e}")
+
     # ------------------------------------------------------------------ #
     # Claude CLI Helper
     # ------------------------------------------------------------------ #
@@ -182,6 +297,7 @@ class AgentManager:
             "type": agent_type,
             "created_at": now.isoformat(),
             "expires_at": expires_at.isoformat(),
+            "expires_ts": expires_at.timestamp(),
             "lifetime_hours": lifetime_hours,
             "working_dir": str(self.working_dir),
             "status": "active",
@@ -205,6 +321,28 @@ class AgentManager:
             "working_dir": str(self.working_dir)
         }
 
+    def iter_agents(self) -> Iterator[Dict[str, Any]]:
+        """
+        Lazily yield a summary dict per agent (use for counts/filters)
+
+        Lock-free: each "agents" dict is replaced, never mutated in place,
+        so the snapshot taken per tool stays consistent while iterating.
+        """
+        snapshot = [(tool, data.get("agents", {})) for tool, data in self.agent_data.items()]
+        return (
+            {
+                "name": agent_name,
+                "tool": tool,
+                "type": metadata.get("type"),
+                "status": metadata.get("status"),
+                "created_at": metadata.get("created_at"),
+                "expires_at": metadata.get("expires_at"),
+                "operator_files": metadata.get("operator_files", [])
+            }
+            for tool, agents in snapshot
+            for agent_name, metadata in agents.items()
+        )
+
     def list_agents(self) -> Dict[str, Any]:
         """
         List all active agents
@@ -212,20 +350,7 @@ class AgentManager:
         Returns:
             {"ok": True, "agents": [...]}
         """
-        agents_list = []
-
-        with self.registry_lock:
-            for tool, data in self.agent_data.items():
-                for agent_name, metadata in data.get("agents", {}).items():
-                    agents_list.append({
-                        "name": agent_name,
-                        "tool": tool,
-                        "type": metadata.get("type"),
-                        "status": metadata.get("status"),
-                        "created_at": metadata.get("created_at"),
-                        "expires_at": metadata.get("expires_at"),
-                        "operator_files": metadata.get("operator_files", [])
-                    })
+        agents_list = list(self.iter_agents())
 
         return {
             "ok": True,
@@ -357,17 +482,11 @@ class AgentManager:
 
         # Update registry with operator file
         with self.registry_lock:
-            metadata["operator_files"].append(operator_file)
+            metadata["operator_files"] = metadata["operator_files"] + [operator_file]
             self._save_registry("claude_code")
 
-        # Execute in background thread
-        thread = threading.Thread(
-            target=self._run_claude_cli_command,
-            args=(agent_name, prompt, operator_path),
-            daemon=True
-        )
-        thread.start()
-        self.background_threads.append(thread)
+        # Execute on the background worker pool
+        self._submit(self._run_claude_cli_command, agent_name, prompt, operator_path)
 
         return {
             "ok": True,
@@ -375,6 +494,12 @@ class AgentManager:
             "message": f"Command dispatched to {agent_name}"
         }
 
+    @staticmethod
+    def _append_operator_log(operator_path: Path, text: str):
+        """Append text to an operator file (no read-modify-write of the whole log)"""
+        with operator_path.open("a", encoding="utf-8") as f:
+            f.write(text)
+
     def _run_claude_cli_command(
         self, agent_name: str, prompt: str, operator_path: Path
     ):
@@ -392,30 +517,30 @@ class AgentManager:
             # Update operator file with result
             status_text = "✅ SUCCESS" if result.returncode == 0 else "❌ FAILED"
 
-            operator_path.write_text(
-                f"{operator_path.read_text()}\n\n"
+            self._append_operator_log(
+                operator_path,
+                "\n\n"
                 f"## Result\nStatus: {status_text}\n"
                 f"Exit Code: {result.returncode}\n\n"
                 f"### Output\n```\n{result.stdout}\n```\n\n"
-                f"### Errors\n```\n{result.stderr}\n```\n",
-                encoding="utf-8"
+                f"### Errors\n```\n{result.stderr}\n```\n"
             )
 
             self.logger.info(f"Claude CLI command completed for {agent_name}")
 
         except subprocess.TimeoutExpired:
-            operator_path.write_text(
-                f"{operator_path.read_text()}\n\n"
-                f"## Result\n❌ TIMEOUT - Command exceeded 30 minutes\n",
-                encoding="utf-8"
+            self._append_operator_log(
+                operator_path,
+                "\n\n"
+                "## Result\n❌ TIMEOUT - Command exceeded 30 minutes\n"
             )
             self.logger.error(f"Claude CLI command timed out for {agent_name}")
 
         except Exception as e:
-            operator_path.write_text(
-                f"{operator_path.read_text()}\n\n"
-                f"## Result\n❌ ERROR: {e}\n",
-                encoding="utf-8"
+            self._append_operator_log(
+                operator_path,
+                "\n\n"
+                f"## Result\n❌ ERROR: {e}\n"
             )
             self.logger.error(f"Claude CLI command failed for {agent_name}: {e}")
 
@@ -443,17 +568,11 @@ class AgentManager:
 
         # Update registry with operator file
         with self.registry_lock:
-            metadata["operator_files"].append(operator_file)
+            metadata["operator_files"] = metadata["operator_files"] + [operator_file]
             self._save_registry("gemini")
 
-        # Execute in background thread
-        thread = threading.Thread(
-            target=self._run_gemini_browser_task,
-            args=(agent_name, prompt, operator_path),
-            daemon=True
-        )
-        thread.start()
-        self.background_threads.append(thread)
+        # Execute on the background worker pool
+        self._submit(self._run_gemini_browser_task, agent_name, prompt, operator_path)
 
         return {
             "ok": True,
@@ -470,11 +589,11 @@ class AgentManager:
             try:
                 from playwright.sync_api import sync_playwright
             except ImportError:
-                operator_path.write_text(
-                    f"{operator_path.read_text()}\n\n"
-                    f"## Result\n❌ ERROR: playwright not installed\n"
-                    f"Install with: pip install playwright && playwright install\n",
-                    encoding="utf-8"
+                self._append_operator_log(
+                    operator_path,
+                    "\n\n"
+                    "## Result\n❌ ERROR: playwright not installed\n"
+                    "Install with: pip install playwright && playwright install\n"
                 )
                 return
 
@@ -483,19 +602,19 @@ class AgentManager:
                 import google.generativeai as genai
                 gemini_api_key = os.environ.get("GEMINI_API_KEY")
                 if not gemini_api_key:
-                    operator_path.write_text(
-                        f"{operator_path.read_text()}\n\n"
-                        f"## Result\n❌ ERROR: GEMINI_API_KEY not set in environment\n",
-                        encoding="utf-8"
+                    self._append_operator_log(
+                        operator_path,
+                        "\n\n"
+                        "## Result\n❌ ERROR: GEMINI_API_KEY not set in environment\n"
                     )
                     return
                 genai.configure(api_key=gemini_api_key)
             except ImportError:
-                operator_path.write_text(
-                    f"{operator_path.read_text()}\n\n"
-                    f"## Result\n❌ ERROR: google-generativeai not installed\n"
-                    f"Install with: pip install google-generativeai\n",
-                    encoding="utf-8"
+                self._append_operator_log(
+                    operator_path,
+                    "\n\n"
+                    "## Result\n❌ ERROR: google-generativeai not installed\n"
+                    "Install with: pip install google-generativeai\n"
                 )
                 return
 
@@ -522,15 +641,15 @@ class AgentManager:
                 result_text = response.text if hasattr(response, 'text') else str(response)
 
                 # Update operator file with result
-                operator_path.write_text(
-                    f"{operator_path.read_text()}\n\n"
+                self._append_operator_log(
+                    operator_path,
+                    "\n\n"
                     f"## Result\n✅ SUCCESS\n"
                     f"Screenshot: {screenshot_path.name}\n\n"
                     f"### Gemini Response\n{result_text}\n\n"
                     f"### Note\n"
                     f"Full browser automation with Gemini Computer Use requires additional setup.\n"
-                    f"This is a basic implementation showing browser control + Gemini analysis.\n",
-                    encoding="utf-8"
+                    f"This is a basic implementation showing browser control + Gemini analysis.\n"
                 )
 
                 browser.close()
@@ -538,10 +657,10 @@ class AgentManager:
             self.logger.info(f"Gemini browser task completed for {agent_name}")
 
         except Exception as e:
-            operator_path.write_text(
-                f"{operator_path.read_text()}\n\n"
-                f"## Result\n❌ ERROR: {e}\n",
-                encoding="utf-8"
+            self._append_operator_log(
+                operator_path,
+                "\n\n"
+                f"## Result\n❌ ERROR: {e}\n"
             )
             self.logger.error(f"Gemini browser task failed for {agent_name}: {e}")
 
@@ -571,17 +690,11 @@ class AgentManager:
 
         # Update registry with operator file
         with self.registry_lock:
-            metadata["operator_files"].append(operator_file)
+            metadata["operator_files"] = metadata["operator_files"] + [operator_file]
             self._save_registry("agent_zero")
 
-        # Execute in background thread
-        thread = threading.Thread(
-            target=self._run_agent_zero_task,
-            args=(agent_name, prompt, operator_path),
-            daemon=True
-        )
-        thread.start()
-        self.background_threads.append(thread)
+        # Execute on the background worker pool
+        self._submit(self._run_agent_zero_task, agent_name, prompt, operator_path)
 
         return {
             "ok": True,
@@ -599,11 +712,11 @@ class AgentManager:
             agent_zero_api_key = os.environ.get("AGENT_ZERO_API_KEY")
 
             if not agent_zero_api_url:
-                operator_path.write_text(
-                    f"{operator_path.read_text()}\n\n"
-                    f"## Result\n❌ ERROR: AGENT_ZERO_API_URL not set in environment\n"
-                    f"Set the API endpoint URL for Agent Zero.\n",
-                    encoding="utf-8"
+                self._append_operator_log(
+                    operator_path,
+                    "\n\n"
+                    "## Result\n❌ ERROR: AGENT_ZERO_API_URL not set in environment\n"
+                    "Set the API endpoint URL for Agent Zero.\n"
                 )
                 return
 
@@ -611,11 +724,11 @@ class AgentManager:
             try:
                 import requests
             except ImportError:
-                operator_path.write_text(
-                    f"{operator_path.read_text()}\n\n"
-                    f"## Result\n❌ ERROR: requests library not installed\n"
-                    f"Install with: pip install requests\n",
-                    encoding="utf-8"
+                self._append_operator_log(
+                    operator_path,
+                    "\n\n"
+                    "## Result\n❌ ERROR: requests library not installed\n"
+                    "Install with: pip install requests\n"
                 )
                 return
 
@@ -644,47 +757,47 @@ class AgentManager:
                 agent_response = result.get("response", "No response received")
                 context_id = result.get("context_id", "N/A")
 
-                operator_path.write_text(
-                    f"{operator_path.read_text()}\n\n"
+                self._append_operator_log(
+                    operator_path,
+                    "\n\n"
                     f"## Result\n✅ SUCCESS\n\n"
                     f"**Context ID:** {context_id}\n\n"
                     f"### Agent Zero Response\n{agent_response}\n\n"
-                    f"### Full API Response\n```json\n{json.dumps(result, indent=2)}\n```\n",
-                    encoding="utf-8"
+                    f"### Full API Response\n```json\n{json.dumps(result, indent=2)}\n```\n"
                 )
             else:
-                operator_path.write_text(
-                    f"{operator_path.read_text()}\n\n"
+                self._append_operator_log(
+                    operator_path,
+                    "\n\n"
                     f"## Result\n❌ ERROR: HTTP {response.status_code}\n"
-                    f"Response: {response.text}\n",
-                    encoding="utf-8"
+                    f"Response: {response.text}\n"
                 )
 
             self.logger.info(f"Agent Zero task completed for {agent_name}")
 
         except requests.exceptions.Timeout:
-            operator_path.write_text(
-                f"{operator_path.read_text()}\n\n"
-                f"## Result\n❌ TIMEOUT - Request exceeded 5 minutes\n",
-                encoding="utf-8"
+            self._append_operator_log(
+                operator_path,
+                "\n\n"
+                "## Result\n❌ TIMEOUT - Request exceeded 5 minutes\n"
             )
             self.logger.error(f"Agent Zero task timed out for {agent_name}")
 
         except requests.exceptions.ConnectionError as e:
-            operator_path.write_text(
-                f"{operator_path.read_text()}\n\n"
+            self._append_operator_log(
+                operator_path,
+                "\n\n"
                 f"## Result\n❌ CONNECTION ERROR\n"
                 f"Could not connect to Agent Zero API at {agent_zero_api_url}\n"
-                f"Error: {e}\n",
-                encoding="utf-8"
+                f"Error: {e}\n"
             )
             self.logger.error(f"Agent Zero connection failed for {agent_name}: {e}")
 
         except Exception as e:
-            operator_path.write_text(
-                f"{operator_path.read_text()}\n\n"
-                f"## Result\n❌ ERROR: {e}\n",
-                encoding="utf-8"
+            self._append_operator_log(
+                operator_path,
+                "\n\n"
+                f"## Result\n❌ ERROR: {e}\n"
             )
             self.logger.error(f"Agent Zero task failed for {agent_name}: {e}")
 
@@ -694,15 +807,14 @@ class AgentManager:
 
     def cleanup_expired_agents(self) -> int:
         """Remove expired agents, returns count of deleted agents"""
-        now = datetime.now(timezone.utc)
+        now_ts = time.time()
         deleted_count = 0
 
         with self.registry_lock:
             for tool, data in self.agent_data.items():
                 to_delete = []
                 for agent_name, metadata in data.get("agents", {}).items():
-                    expires_at = datetime.fromisoformat(metadata.get("expires_at"))
-                    if now > expires_at:
+                    if metadata.get("expires_ts", float("inf")) < now_ts:
                         to_delete.append(agent_name)
 
                 # Delete expired agents
@@ -7,8 +7,23 @@ License: MIT
 """
 
 import numpy as np
+from scipy.fft import rfft, irfft
 import tensorflow.lite as tflite
 import os
+import queue
+import threading
+import atexit
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ThreadPoolExecutor
+
+# External XNNPACK delegate library (optional - stock TF builds already apply
+# XNNPACK to float models, so a missing library just falls back to that)
+XNNPACK_DELEGATE_LIB = 'libtensorflowlite_xnnpack_delegate.so'
+
+# Reduced-precision model variants, looked up as dtln_aec_<size>_<n>_<precision>.tflite
+# next to the float models (both halves must exist, otherwise float32 is used)
+MODEL_PRECISIONS = ('int8', 'fp16')
 
 class DTLNAECRealtime:
     """
@@ -16,7 +31,8 @@ class DTLNAECRealtime:
     Processes audio in streaming fashion with low latency.
     """
 
-    def __init__(self, model_size=128):
+    def __init__(self, model_size=128, num_threads=2, silence_threshold=64,
+                 dedicated_thread=True, cpu_ids=None, precision='fp32'):
         """
         Initialize DTLN-aec for real-time processing.
 
@@ -24,21 +40,37 @@ class DTLNAECRealtime:
         -----------
         model_size : int
             Model size - 128 (fastest), 256 (balanced), or 512 (best quality)
+        num_threads : int
+            Threads per TFLite interpreter (kept small - AEC is real-time, not bulk)
+        silence_threshold : int
+            Hops where both mic and loopback peak below this (int16) skip the
+            models entirely. 0 disables the gate.
+        dedicated_thread : bool
+            Run inference on one long-lived thread pinned to its own CPUs with
+            SCHED_FIFO priority (where permitted) to cut jitter on the hop deadline
+        cpu_ids : set of int, optional
+            CPUs for the dedicated thread (default: the last num_threads CPUs)
+        precision : str
+            Model precision - 'fp32' (default, the shipped models), or
+            'int8' (dynamic-range quantized) / 'fp16' when those files have
+            been generated. Falls back to the float32 models, with a warning,
+            when a requested quantized pair is not present.
         """
+        self.num_threads = num_threads
+        self.silence_threshold = silence_threshold
+        self.cpu_ids = cpu_ids
+
         # Determine model path
         model_dir = os.path.join(os.path.dirname(__file__), 'DTLN-aec', 'pretrained_models')
         model_base = f'dtln_aec_{model_size}'
+        model_paths, self.precision = self._resolve_model_paths(model_dir, model_base, precision)
 
-        # Load TFLite models
-        self.interpreter_1 = tflite.Interpreter(
-            model_path=os.path.join(model_dir, f'{model_base}_1.tflite')
-        )
-        self.interpreter_1.allocate_tensors()
-
-        self.interpreter_2 = tflite.Interpreter(
-            model_path=os.path.join(model_dir, f'{model_base}_2.tflite')
-        )
-        self.interpreter_2.allocate_tensors()
+        # Load both TFLite models in parallel (halves cold-start time)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            future_1 = executor.submit(self._load_interpreter, model_paths[0])
+            future_2 = executor.submit(self._load_interpreter, model_paths[1])
+            self.interpreter_1 = future_1.result()
+            self.interpreter_2 = future_2.result()
 
         # Get input/output details
         self.input_details_1 = self.interpreter_1.get_input_details()
@@ -46,147 +78,440 @@ class DTLNAECRealtime:
         self.input_details_2 = self.interpreter_2.get_input_details()
         self.output_details_2 = self.interpreter_2.get_output_details()
 
-        # Initialize LSTM states
-        self.states_1 = np.zeros(self.input_details_1[1]['shape']).astype('float32')
-        self.states_2 = np.zeros(self.input_details_2[1]['shape']).astype('float32')
+        # Zero-copy tensor accessors. Only the accessor functions are kept -
+        # TFLite refuses to invoke() while a numpy view of its buffers is alive.
+        # Model 1 inputs: [mic_magnitude, states, loopback_magnitude]
+        self._in_mag_1 = self.interpreter_1.tensor(self.input_details_1[0]['index'])
+        self._states_in_1 = self.interpreter_1.tensor(self.input_details_1[1]['index'])
+        self._lpb_mag_1 = self.interpreter_1.tensor(self.input_details_1[2]['index'])
+        self._mask_out_1 = self.interpreter_1.tensor(self.output_details_1[0]['index'])
+        self._states_out_1 = self.interpreter_1.tensor(self.output_details_1[1]['index'])
+        # Model 2 inputs: [estimated_speech, states, loopback_time_domain]
+        self._est_in_2 = self.interpreter_2.tensor(self.input_details_2[0]['index'])
+        self._states_in_2 = self.interpreter_2.tensor(self.input_details_2[1]['index'])
+        self._lpb_in_2 = self.interpreter_2.tensor(self.input_details_2[2]['index'])
+        self._block_out_2 = self.interpreter_2.tensor(self.output_details_2[0]['index'])
+        self._states_out_2 = self.interpreter_2.tensor(self.output_details_2[1]['index'])
+
+        # Initialize LSTM states (kept directly in the interpreters' input tensors)
+        self._states_in_1().fill(0)
+        self._states_in_2().fill(0)
 
         # Buffer settings (from original DTLN-aec)
         self.block_len = 512       # FFT size
         self.block_shift = 128     # Hop size - DTLN processes 128 samples at a time
 
-        # Input buffering for variable chunk sizes
-        self.input_buffer_mic = []
-        self.input_buffer_ref = []
-        self.output_buffer_queue = []
+        # Input/output ring buffers for variable chunk sizes (power of two length
+        # so cursors wrap with a mask; one slot is kept free to tell full from empty)
+        self.ring_size = 4096
+        self.ring_mask = self.ring_size - 1
+        self._mic_ring = np.zeros(self.ring_size, dtype=np.int16)
+        self._ref_ring = np.zeros(self.ring_size, dtype=np.int16)
+        self._out_ring = np.zeros(self.ring_size, dtype=np.int16)
+        self._mic_w = self._mic_r = 0
+        self._ref_w = self._ref_r = 0
+        self._out_w = self._out_r = 0
 
         # Initialize buffers
         self.in_buffer = np.zeros(self.block_len).astype('float32')
         self.in_buffer_lpb = np.zeros(self.block_len).astype('float32')
         self.out_buffer = np.zeros(self.block_len).astype('float32')
 
+        # int16 <-> float32 scale factors as numpy scalars (keeps the math in float32)
+        self._norm_in = np.float32(1.0 / 32768.0)
+        self._norm_out = np.float32(32767.0)
+
+        # Staging buffers for the normalized 128-sample hop and its output
+        self._out_frame = np.empty(self.block_shift, dtype=np.float32)
+        # (row 0 = mic, row 1 = loopback, converted together in one kernel call)
+        self._io_int16 = np.empty((2, self.block_shift), dtype=np.int16)
+        self._io_f32 = np.empty((2, self.block_shift), dtype=np.float32)
+
+        # Scratch for the masked spectrum (pocketfft caches the 512-point plan)
+        self._mask_mul = np.empty((1, 1, self.block_len // 2 + 1), dtype=np.complex64)
+
         # Initialize with padding
         padding = np.zeros(self.block_len - self.block_shift)
         self.in_buffer[:len(padding)] = padding
         self.in_buffer_lpb[:len(padding)] = padding
 
-        print(f"   🤖 DTLN-aec initialized (model size: {model_size})")
+        # Dedicated inference thread - process_frame hands frames to it
+        self._requests = queue.SimpleQueue()
+        self._dtln_thread = None
+        if dedicated_thread:
+            self._dtln_thread = threading.Thread(target=self._dtln_worker, name="dtln-aec", daemon=True)
+            self._dtln_thread.start()
+
+        print(f"   🤖 DTLN-aec initialized (model size: {model_size}, precision: {self.precision})")
         print(f"   ⚡ Block: {self.block_len}, Shift: {self.block_shift}, Latency: ~30ms")
 
-    def process_frame(self, mic_chunk, reference_chunk):
+    @staticmethod
+    def _resolve_model_paths(model_dir, model_base, precision):
+        """Pick the model pair for the requested precision, returns (paths, precision used)"""
+        if precision in MODEL_PRECISIONS:
+            paths = [os.path.join(model_dir, f'{model_base}_{n}_{precision}.tflite') for n in (1, 2)]
+            if all(os.path.exists(path) for path in paths):
+                return paths, precision
+            print(f"   ⚠️  DTLN-aec {precision} models not found - using float32")
+        elif precision != 'fp32':
+            raise ValueError(f"Unknown DTLN-aec precision: {precision}")
+
+        return [os.path.join(model_dir, f'{model_base}_{n}.tflite') for n in (1, 2)], 'fp32'
+
+    def _load_interpreter(self, model_path):
+        """Create a TFLite interpreter, preferring the XNNPACK delegate when available"""
+        try:
+            delegates = [tflite.experimental.load_delegate(XNNPACK_DELEGATE_LIB)]
+        except (ValueError, OSError, AttributeError):
+            delegates = None
+
+        try:
+            interpreter = tflite.Interpreter(
+                model_path=model_path,
+                num_threads=self.num_threads,
+                experimental_delegates=delegates
+            )
+            interpreter.allocate_tensors()
+        except (ValueError, RuntimeError):
+            if delegates is None:
+                raise
+            # Delegate could not take the LSTM graph - use the built-in kernels
+            interpreter = tflite.Interpreter(model_path=model_path, num_threads=self.num_threads)
+            interpreter.allocate_tensors()
+        return interpreter
+
+    def _ring_write(self, ring, w, data):
+        """Copy data into ring starting at cursor w, returns the new write cursor"""
+        n = len(data)
+        first = min(n, self.ring_size - w)
+        np.copyto(ring[w:w + first], data[:first], casting='unsafe')
+        if first < n:
+            np.copyto(ring[:n - first], data[first:], casting='unsafe')
+        return (w + n) & self.ring_mask
+
+    def _ring_read(self, ring, r, n, out=None):
+        """Copy n samples out of ring starting at cursor r (into out, if given)"""
+        end = r + n
+        if out is None:
+            if end <= self.ring_size:
+                return ring[r:end].copy()
+            return np.concatenate((ring[r:], ring[:end - self.ring_size]))
+
+        first = min(n, self.ring_size - r)
+        out[:first] = ring[r:r + first]
+        out[first:n] = ring[:n - first]
+        return out[:n]
+
+    def _set_realtime_priority(self):
+        """Pin the calling thread to its CPUs and request SCHED_FIFO (best effort)"""
+        if hasattr(os, 'sched_setaffinity'):
+            try:
+                cpus = self.cpu_ids or set(sorted(os.sched_getaffinity(0))[-self.num_threads:])
+                os.sched_setaffinity(0, cpus)
+            except (OSError, ValueError):
+                pass
+
+        if hasattr(os, 'sched_setscheduler'):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+            except OSError:
+                # Unprivileged - stay on the default scheduler
+                pass
+
+    def _dtln_worker(self):
+        """Inference thread loop: serve (mic, ref, response) requests forever"""
+        self._set_realtime_priority()
+        while True:
+            mic_chunk, reference_chunk, out, response = self._requests.get()
+            try:
+                response.put(self._process_frame(mic_chunk, reference_chunk, out))
+            except Exception as e:
+                response.put(e)
+
+    def _process_hop(self):
         """
-        Process one frame of audio for echo cancellation.
-        Handles variable-size chunks by buffering and processing in 128-sample blocks.
-
-        Parameters:
-        -----------
-        mic_chunk : np.ndarray
-            Microphone input (int16, any size but typically 480 samples)
-        reference_chunk : np.ndarray
-            Speaker output/loopback (int16, same size as mic_chunk)
-
-        Returns:
-        --------
-        np.ndarray : Echo-cancelled audio (int16, same size as input)
+        Run one 128-sample hop staged in self._io_int16 (row 0 mic, row 1 loopback)
+        through DTLN-aec, leaving the int16-scaled output in self._out_frame.
         """
-        # Add incoming samples to input buffers
-        self.input_buffer_mic.extend(mic_chunk.tolist())
-        self.input_buffer_ref.extend(reference_chunk.tolist())
-
-        # Process all complete 128-sample blocks
-        while len(self.input_buffer_mic) >= self.block_shift:
-            # Extract 128 samples
-            mic_block = np.array(self.input_buffer_mic[:self.block_shift], dtype=np.int16)
-            ref_block = np.array(self.input_buffer_ref[:self.block_shift], dtype=np.int16)
-
-            # Remove processed samples from buffers
-            self.input_buffer_mic = self.input_buffer_mic[self.block_shift:]
-            self.input_buffer_ref = self.input_buffer_ref[self.block_shift:]
-
-            # Convert to float32 and normalize
-            mic_float = mic_block.astype('float32') / 32768.0
-            lpb_float = ref_block.astype('float32') / 32768.0
-
-            # Update buffers (overlap-add)
-            self.in_buffer[:-self.block_shift] = self.in_buffer[self.block_shift:]
-            self.in_buffer[-self.block_shift:] = mic_float
-
-            self.in_buffer_lpb[:-self.block_shift] = self.in_buffer_lpb[self.block_shift:]
-            self.in_buffer_lpb[-self.block_shift:] = lpb_float
-
+        # Convert mic and loopback to float32 and normalize in a single pass
+        np.multiply(self._io_int16, self._norm_in, out=self._io_f32,
+                    dtype=np.float32, casting='unsafe')
+
+        # Update buffers (overlap-add)
+        self.in_buffer[:-self.block_shift] = self.in_buffer[self.block_shift:]
+        self.in_buffer[-self.block_shift:] = self._io_f32[0]
+
+        self.in_buffer_lpb[:-self.block_shift] = self.in_buffer_lpb[self.block_shift:]
+        self.in_buffer_lpb[-self.block_shift:] = self._io_f32[1]
+
+        # Silence gate: nothing to cancel, so skip FFT + both models and
+        # just let the overlap-add tail play out (LSTM states are kept)
+        if (self.silence_threshold
+                and self._io_int16.max() < self.silence_threshold
+                and self._io_int16.min() > -self.silence_threshold):
+            self.out_buffer[:-self.block_shift] = self.out_buffer[self.block_shift:]
+            self.out_buffer[-self.block_shift:] = 0
+        else:
             # === FIRST MODEL: Spectral Mask Estimation ===
             # Calculate FFT
-            in_block_fft = np.fft.rfft(self.in_buffer).astype('complex64')
-            lpb_block_fft = np.fft.rfft(self.in_buffer_lpb).astype('complex64')
-
-            # Calculate magnitudes
-            in_mag = np.abs(in_block_fft).reshape(1, 1, -1).astype('float32')
-            lpb_mag = np.abs(lpb_block_fft).reshape(1, 1, -1).astype('float32')
+            in_block_fft = rfft(self.in_buffer, workers=1)
+            lpb_block_fft = rfft(self.in_buffer_lpb, workers=1)
 
-            # Set tensors for first model
-            # Input order: [mic_magnitude, states, loopback_magnitude]
-            self.interpreter_1.set_tensor(self.input_details_1[0]['index'], in_mag)
-            self.interpreter_1.set_tensor(self.input_details_1[2]['index'], lpb_mag)
-            self.interpreter_1.set_tensor(self.input_details_1[1]['index'], self.states_1)
+            # Calculate magnitudes straight into the first model's inputs
+            # (states already hold the last output)
+            np.abs(in_block_fft, out=self._in_mag_1()[0, 0])
+            np.abs(lpb_block_fft, out=self._lpb_mag_1()[0, 0])
 
             # Run first model
             self.interpreter_1.invoke()
 
-            # Get outputs
-            out_mask = self.interpreter_1.get_tensor(self.output_details_1[0]['index'])
-            self.states_1 = self.interpreter_1.get_tensor(self.output_details_1[1]['index'])
+            # Apply mask straight from the output tensor, then carry states over
+            np.multiply(in_block_fft, self._mask_out_1(), out=self._mask_mul)
+            np.copyto(self._states_in_1(), self._states_out_1())
 
-            # Apply mask and IFFT
-            estimated_block = np.fft.irfft(in_block_fft * out_mask)
+            # IFFT
+            estimated_block = irfft(self._mask_mul, n=self.block_len, overwrite_x=True)
 
             # === SECOND MODEL: Time-domain Refinement ===
-            # Reshape for second model
-            estimated_block_reshaped = estimated_block.reshape(1, 1, -1).astype('float32')
-            in_lpb_reshaped = self.in_buffer_lpb.reshape(1, 1, -1).astype('float32')
-
-            # Set tensors for second model
-            # Input order: [estimated_speech, states, loopback_time_domain]
-            self.interpreter_2.set_tensor(self.input_details_2[0]['index'], estimated_block_reshaped)
-            self.interpreter_2.set_tensor(self.input_details_2[1]['index'], self.states_2)
-            self.interpreter_2.set_tensor(self.input_details_2[2]['index'], in_lpb_reshaped)
+            # Write inputs for second model
+            np.copyto(self._est_in_2()[0, 0], estimated_block)
+            np.copyto(self._lpb_in_2()[0, 0], self.in_buffer_lpb)
 
             # Run second model
             self.interpreter_2.invoke()
 
-            # Get output
-            out_block = self.interpreter_2.get_tensor(self.output_details_2[0]['index'])
-            self.states_2 = self.interpreter_2.get_tensor(self.output_details_2[1]['index'])
-
-            # Update output buffer (overlap-add)
+            # Update output buffer (overlap-add) straight from the output tensor
             self.out_buffer[:-self.block_shift] = self.out_buffer[self.block_shift:]
-            self.out_buffer[-self.block_shift:] = np.zeros(self.block_shift)
-            self.out_buffer += np.squeeze(out_block)
+            self.out_buffer[-self.block_shift:] = 0
+            self.out_buffer += self._block_out_2().reshape(-1)
+            np.copyto(self._states_in_2(), self._states_out_2())
 
-            # Extract output frame
-            output = self.out_buffer[:self.block_shift].copy()
+        # Extract output frame, clipped to prevent overflow, scaled for int16
+        np.clip(self.out_buffer[:self.block_shift], -1.0, 1.0, out=self._out_frame)
+        np.multiply(self._out_frame, self._norm_out, out=self._out_frame)
 
-            # Clip to prevent overflow
-            output = np.clip(output, -1.0, 1.0)
+    def process_frame(self, mic_chunk, reference_chunk, out=None):
+        """
+        Process one frame of audio for echo cancellation.
+        Handles variable-size chunks by buffering and processing in 128-sample blocks.
 
-            # Convert back to int16
-            output_int16 = (output * 32767.0).astype(np.int16)
+        Parameters:
+        -----------
+        mic_chunk : np.ndarray
+            Microphone input (int16, any size but typically 480 samples)
+        reference_chunk : np.ndarray
+            Speaker output/loopback (int16, same size as mic_chunk)
+        out : np.ndarray, optional
+            Preallocated int16 array (at least mic_chunk's size) to write the
+            result into instead of allocating a new one
+
+        Returns:
+        --------
+        np.ndarray : Echo-cancelled audio (int16, same size as input)
+        """
+        if self._dtln_thread is None:
+            return self._process_frame(mic_chunk, reference_chunk, out)
+
+        response = queue.SimpleQueue()
+        self._requests.put((mic_chunk, reference_chunk, out, response))
+        result = response.get()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _process_frame(self, mic_chunk, reference_chunk, out=None):
+        """Buffer a frame into 128-sample hops and process them (see process_frame)"""
+        # Fast path: a native 128-sample chunk with nothing buffered is exactly
+        # one hop, so it can bypass the input and output rings
+        if (len(mic_chunk) == self.block_shift
+                and self._mic_w == self._mic_r and self._out_w == self._out_r):
+            self._io_int16[0] = mic_chunk
+            self._io_int16[1] = reference_chunk
+            self._process_hop()
+            if out is None:
+                return self._out_frame.astype(np.int16)
+            out[:self.block_shift] = self._out_frame
+            return out[:self.block_shift]
+
+        # Add incoming samples to input rings
+        self._mic_w = self._ring_write(self._mic_ring, self._mic_w, mic_chunk)
+        self._ref_w = self._ring_write(self._ref_ring, self._ref_w, reference_chunk)
 
-            # Add to output queue
-            self.output_buffer_queue.extend(output_int16.tolist())
+        # Process all complete 128-sample blocks
+        while ((self._mic_w - self._mic_r) & self.ring_mask) >= self.block_shift:
+            # Stage 128 samples (read cursor stays block aligned, so never wraps)
+            self._io_int16[0] = self._mic_ring[self._mic_r:self._mic_r + self.block_shift]
+            self._io_int16[1] = self._ref_ring[self._ref_r:self._ref_r + self.block_shift]
+
+            # Advance read cursors
+            self._mic_r = (self._mic_r + self.block_shift) & self.ring_mask
+            self._ref_r = (self._ref_r + self.block_shift) & self.ring_mask
+
+            self._process_hop()
+
+            # Add to output ring (the int16 cast truncates, like astype)
+            self._out_w = self._ring_write(self._out_ring, self._out_w, self._out_frame)
 
         # Return requested number of samples (same as input size)
         output_size = len(mic_chunk)
-        if len(self.output_buffer_queue) >= output_size:
-            result = np.array(self.output_buffer_queue[:output_size], dtype=np.int16)
-            self.output_buffer_queue = self.output_buffer_queue[output_size:]
+        if ((self._out_w - self._out_r) & self.ring_mask) >= output_size:
+            result = self._ring_read(self._out_ring, self._out_r, output_size, out)
+            self._out_r = (self._out_r + output_size) & self.ring_mask
             return result
         else:
             # Not enough output yet (startup condition), return zeros
-            return np.zeros(output_size, dtype=np.int16)
+            if out is None:
+                return np.zeros(output_size, dtype=np.int16)
+            out[:output_size] = 0
+            return out[:output_size]
 
     def reset(self):
         """Reset internal states (useful when conversation starts/stops)"""
-        self.states_1 = np.zeros(self.input_details_1[1]['shape']).astype('float32')
-        self.states_2 = np.zeros(self.input_details_2[1]['shape']).astype('float32')
+        self._states_in_1().fill(0)
+        self._states_in_2().fill(0)
         self.in_buffer = np.zeros(self.block_len).astype('float32')
         self.in_buffer_lpb = np.zeros(self.block_len).astype('float32')
         self.out_buffer = np.zeros(self.block_len).astype('float32')
+        self._mic_w = self._mic_r = 0
+        self._ref_w = self._ref_r = 0
+        self._out_w = self._out_r = 0
+
+
+class DTLNAECProcess:
+    """
+    DTLN-aec running in a child process, so inference never competes with
+    the caller's threads for the GIL. Frames are exchanged through shared
+    memory; the pipe only carries the frame length and a status reply.
+    """
+
+    def __init__(self, frame_size=480, startup_timeout=60.0, **options):
+        """
+        Start the AEC worker process and wait for its models to load.
+
+        Parameters:
+        -----------
+        frame_size : int
+            Largest frame (samples) process_frame will be given
+        startup_timeout : float
+            Seconds to wait for the worker to report its models loaded
+        **options :
+            Passed to DTLNAECRealtime in the child (dedicated_thread is
+            forced off - the child's main thread is the inference thread)
+        """
+        self.frame_size = frame_size
+        options['dedicated_thread'] = False
+        # Held for each pipe round trip, so close() never frees a frame in flight
+        self._lock = threading.Lock()
+
+        # Rows: mic in, loopback in, cleaned out
+        self._shm = shared_memory.SharedMemory(create=True, size=3 * frame_size * 2)
+        self._frames = np.ndarray((3, frame_size), dtype=np.int16, buffer=self._shm.buf)
+
+        # spawn, not fork - the parent has already loaded TensorFlow and started threads
+        ctx = multiprocessing.get_context('spawn')
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_aec_process_main,
+            args=(self._shm.name, frame_size, options, child_conn),
+            name="dtln-aec",
+            daemon=True
+        )
+        try:
+            self._process.start()
+            child_conn.close()
+
+            # A worker that crashes closes the pipe (EOFError); one that hangs never answers
+            if not self._conn.poll(startup_timeout):
+                error = f"no response within {startup_timeout:g}s"
+            else:
+                error = self._conn.recv()
+        except EOFError:
+            error = "worker exited during startup"
+        except OSError as e:
+            error = repr(e)
+
+        if error is not None:
+            self.close()
+            raise RuntimeError(f"DTLN-aec process failed to start: {error}")
+        atexit.register(self.close)
+
+    def process_frame(self, mic_chunk, reference_chunk, out=None):
+        """Same contract as DTLNAECRealtime.process_frame, run in the child process"""
+        n = len(mic_chunk)
+        if n > self.frame_size:
+            raise ValueError(f"Frame of {n} samples exceeds frame_size {self.frame_size}")
+
+        with self._lock:
+            if self._shm is None:
+                raise RuntimeError("DTLN-aec process is closed")
+
+            self._frames[0, :n] = mic_chunk
+            self._frames[1, :n] = reference_chunk
+            self._conn.send(n)
+            error = self._conn.recv()
+            if error is not None:
+                raise RuntimeError(error)
+
+            if out is None:
+                return self._frames[2, :n].copy()
+            out[:n] = self._frames[2, :n]
+        return out[:n]
+
+    def reset(self):
+        """Reset the child's DTLN-aec state"""
+        with self._lock:
+            if self._shm is None:
+                return
+            self._conn.send('reset')
+            self._conn.recv()
+
+    def close(self):
+        """Stop the worker process and release the shared memory"""
+        # Taking the lock waits out a frame the listen thread may have in flight
+        with self._lock:
+            if self._shm is None:
+                return
+            atexit.unregister(self.close)
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+            if self._process.pid is not None:  # Started
+                self._process.join(timeout=1.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._frames = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def _aec_process_main(shm_name, frame_size, options, conn):
+    """Child process loop: process frames in shared memory until the pipe closes"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((3, frame_size), dtype=np.int16, buffer=shm.buf)
+    try:
+        aec = DTLNAECRealtime(**options)
+        aec._set_realtime_priority()
+    except Exception as e:
+        conn.send(repr(e))
+        return
+    conn.send(None)
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        try:
+            if request == 'reset':
+                aec.reset()
+            else:
+                aec.process_frame(frames[0, :request], frames[1, :request], frames[2, :request])
+            conn.send(None)
+        except Exception as e:
+            conn.send(repr(e))
+
+    del frames
+    shm.close()
@@ -0,0 +1,97 @@
+"""Realtime frames reach the handlers as bytes (connect() skips UTF-8 validation)."""
+
+import base64
+import json
+
+import pytest
+
+pytest.importorskip("pyaudio")
+pytest.importorskip("websocket")
+
+from voice_chat_client import VoiceChatClient
+
+
+class _FakeClient:
+    """Just the attributes VoiceChatClient.on_message touches"""
+
+    def __init__(self):
+        self.deltas = []
+        self.events = []
+        self._event_handlers = {"session.updated": self.events.append}
+
+    def _queue_audio_delta(self, delta):
+        self.deltas.append(delta)
+
+
+def test_audio_delta_bytes_frame():
+    fake = _FakeClient()
+    audio = base64.b64encode(b"\x01\x02" * 8)
+    frame = b'{"type":"response.audio.delta","event_id":"ev_1","delta":"' + audio + b'"}'
+
+    VoiceChatClient.on_message(fake, None, frame)
+
+    assert base64.b64decode(fake.deltas[0]) == b"\x01\x02" * 8
+    assert fake.events == []
+
+
+@pytest.mark.parametrize("frame", [
+    b'{"type":"session.updated","session":{"voice":"alloy"}}',
+    '{"type":"session.updated","session":{"voice":"alloy"}}',
+])
+def test_event_frame(frame):
+    fake = _FakeClient()
+
+    VoiceChatClient.on_message(fake, None, frame)
+
+    assert fake.events == [{"type": "session.updated", "session": {"voice": "alloy"}}]
+    assert fake.deltas == []
+
+
+def _desktop():
+    pytest.importorskip("eel")
+    pytest.importorskip("dotenv")
+    import voice_chat_desktop
+    return voice_chat_desktop
+
+
+def test_peek_event_type_bytes_frame():
+    desktop = _desktop()
+
+    assert desktop._peek_event_type(b'{"type":"response.done","response":{}}') == "response.done"
+    assert desktop._peek_event_type(b'{"type": "response.done"}') is None
+    # A nested "type" ahead of the top-level key must not be mistaken for it
+    assert desktop._peek_event_type(
+        b'{"event_id":"ev_1","item":{"type":"message"},"type":"conversation.item.created"}'
+    ) is None
+
+
+def test_nested_type_frame_reaches_ui_handler(monkeypatch):
+    desktop = _desktop()
+    shown = []
+    monkeypatch.setattr(desktop.eel, "add_user_message", shown.append, raising=False)
+    frame = json.dumps({
+        "event_id": "ev_1",
+        "item": {"type": "message", "role": "user",
+                 "content": [{"type": "input_audio", "transcript": "hello"}]},
+        "type": "conversation.item.created",
+    }, separators=(",", ":")).encode()
+
+    desktop._dispatch_ui_event(frame)
+
+    assert shown == ["hello"]
+
+
+@pytest.mark.parametrize("text", ["hi", 'say "hi"', "trailing \\", "two\nlines", "é ✓"])
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_text_delta_bytes_frame(monkeypatch, text, ensure_ascii):
+    desktop = _desktop()
+    queued = []
+    monkeypatch.setattr(desktop, "_queue_typing", queued.append)
+    frame = json.dumps(
+        {"type": "response.text.delta", "event_id": "ev_1", "delta": text, "item_id": "item_1"},
+        separators=(",", ":"), ensure_ascii=ensure_ascii,
+    ).encode()
+
+    desktop._ui_text_delta_raw(frame)
+
+    assert queued == [text]
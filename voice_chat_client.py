@@ -21,6 +21,11 @@ import base64
 import queue
 import signal
 import os
+import math
+import array
+import platform
+import traceback
+from collections import deque
 
 # Try to import required libraries
 try:
@@ -32,6 +37,20 @@ except ImportError:
     print("   Install with: pip3 install pyaudio")
     sys.exit(1)
 
+try:
+    import orjson
+    json_loads = orjson.loads
+    json_encode = orjson.dumps  # bytes - websocket-client sends them as-is in a text frame
+
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    ORJSON_ENABLED = True
+except ImportError:
+    json_loads = json.loads
+    json_encode = json_dumps = json.dumps
+    ORJSON_ENABLED = False
+
 try:
     import webrtcvad
     VAD_ENABLED = True
@@ -58,7 +77,13 @@ except ImportError:
     print("   For better AEC: pip3 install scipy")
 
 try:
-    from dtln_aec_realtime import DTLNAECRealtime
+    from numba import njit
+    NUMBA_ENABLED = NUMPY_ENABLED
+except ImportError:
+    NUMBA_ENABLED = False
+
+try:
+    from dtln_aec_realtime import DTLNAECRealtime, DTLNAECProcess
     DTLN_ENABLED = True
 except ImportError:
     DTLN_ENABLED = False
@@ -79,104 +104,192 @@ CHUNK_SIZE = 480  # 30ms at 16kHz for VAD
 # VAD configuration - using client-side VAD for now
 CONTINUOUS_STREAMING = False  # Use client-side VAD to detect speech
 
+# Input samples of history the streaming 24kHz -> 16kHz resampler keeps
+# between chunks (multiple of 3, >= half the 61-tap FIR at the 2x upsampled rate)
+RESAMPLE_HISTORY = 30
+
+# Raw-frame prefix of audio delta events, decoded without a full JSON parse
+_AUDIO_DELTA_PREFIX = b'{"type":"response.audio.delta"'
+_DELTA_FIELD = b'"delta":"'
+
+# Continuous streaming sends mic audio once this much has accumulated
+# (4 x 30ms frames = 120ms, ~5KB of base64 per input_audio_buffer.append,
+# so websocket-client's per-frame header + masking setup is amortized)
+SEND_COALESCE_BYTES = 4 * CHUNK_SIZE * 2
+
+# Captured mic frames allowed to wait for the listen loop (~1s at 30ms frames)
+INPUT_QUEUE_MAX_CHUNKS = 32
+
+# Resampled echo-reference chunks the output callback can hand to the listen
+# thread before the oldest are dropped (far more than the 500ms ring holds)
+REF_HANDOFF_MAX_CHUNKS = 64
+
+# Playback queue bound in TTS chunks - the server streams faster than real
+# time, so this must hold a whole long answer (only a stalled speaker fills it)
+OUTPUT_QUEUE_MAX_CHUNKS = 1024
+
+# input_audio_buffer.append event split around its base64 audio payload
+_AUDIO_APPEND_PREFIX = b'{"type":"input_audio_buffer.append","audio":"'
+_AUDIO_APPEND_SUFFIX = b'"}'
+_AUDIO_COMMIT_EVENT = b'{"type":"input_audio_buffer.commit"}'
+
+# response.create with tool usage enabled - "auto" lets the model decide when to use tools
+_RESPONSE_CREATE_EVENT = json_encode({
+    "type": "response.create",
+    "response": {
+        "modalities": ["text", "audio"],
+        "tool_choice": "auto"
+    }
+})
+
+# Events too frequent to log individually
+_QUIET_EVENTS = frozenset((
+    "response.audio.delta",
+    "input_audio_buffer.speech_started",
+    "input_audio_buffer.speech_stopped",
+))
+
 # Echo cancellation configuration
 ECHO_SUPPRESSION_ENABLED = True  # Enable echo cancellation
 ECHO_SUPPRESSION_RATIO = 0.95  # How much to suppress echo (0.0-1.0)
 DEBUG_AEC = True  # Enable AEC debugging output (set True to see echo cancellation stats)
-AEC_FILTER_LENGTH = 256  # Adaptive filter taps (16ms at 16kHz)
-AEC_STEP_SIZE = 0.5  # NLMS learning rate (mu) - can be higher due to normalization
+AEC_SEPARATE_PROCESS = True  # Run DTLN-aec inference in a child process (off the GIL)
+
+# Function tools offered to the model in session.update (built once at import)
+TOOLS_SCHEMA = [
+    {
+        "type": "function",
+        "name": "create_agent",
+        "description": "Create a new AI agent (Claude Code for coding, Gemini for browser automation, or Agent Zero for general tasks)",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "tool": {
+                    "type": "string",
+                    "enum": ["claude_code", "gemini", "agent_zero"],
+                    "description": "Type of agent to create"
+                },
+                "agent_type": {
+                    "type": "string",
+                    "description": "Agent type (agentic_coding, agentic_browsing, agentic_general)"
+                },
+                "agent_name": {
+                    "type": "string",
+                    "description": "Unique name for the agent"
+                },
+                "lifetime_hours": {
+                    "type": "number",
+                    "description": "How many hours the agent should live (default 24)",
+                    "default": 24
+                }
+            },
+            "required": ["tool", "agent_type", "agent_name"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "list_agents",
+        "description": "List all active AI agents and their status",
+        "parameters": {
+            "type": "object",
+            "properties": {}
+        }
+    },
+    {
+        "type": "function",
+        "name": "command_agent",
+        "description": "Send a command or instruction to an existing agent",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "agent_name": {
+                    "type": "string",
+                    "description": "Name of the agent to command"
+                },
+                "prompt": {
+                    "type": "string",
+                    "description": "Command or instruction for the agent"
+                }
+            },
+            "required": ["agent_name", "prompt"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "delete_agent",
+        "description": "Delete an agent and remove it from the registry",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "agent_name": {
+                    "type": "string",
+                    "description": "Name of the agent to delete"
+                }
+            },
+            "required": ["agent_name"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "get_agent_status",
+        "description": "Get detailed status and metadata for an agent",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "agent_name": {
+                    "type": "string",
+                    "description": "Name of the agent to query"
+                }
+            },
+            "required": ["agent_name"]
+        }
+    }
+]
 
+# Shared read-only reference frame used when no TTS audio is buffered
+if NUMPY_ENABLED:
+    _SILENCE_FRAME = np.zeros(CHUNK_SIZE, dtype=np.int16)
+    _SILENCE_FRAME.setflags(write=False)
 
-class RLSEchoCanceller:
-    """
-    Recursive Least Squares (RLS) adaptive echo canceller with double-talk detection.
 
-    RLS converges 10-100x faster than NLMS, making it ideal for real-time AEC.
-    Based on: https://github.com/Keyvanhardani/Python-Acoustic-Echo-Cancellation-Library
+def _raise_thread_priority():
     """
-    def __init__(self, filter_length=256, forgetting_factor=0.98, reg_param=1.0):
-        self.filter_length = filter_length
-        self.lambda_val = forgetting_factor  # 0.95-0.99, higher = more stable
-        self.reg_param = reg_param  # Regularization to prevent instability
-
-        # RLS filter state
-        self.weights = np.zeros(filter_length, dtype=np.float64)
-        self.P = np.eye(filter_length, dtype=np.float64) / reg_param  # Inverse correlation matrix
-        self.reference_buffer = np.zeros(filter_length, dtype=np.float64)
-        self.epsilon = 1e-10
-
-        # Double-talk detection (Geigel algorithm)
-        self.geigel_window_size = 128
-        self.geigel_window = np.zeros(self.geigel_window_size, dtype=np.float64)
-        self.geigel_index = 0
-
-    def _detect_double_talk(self, mic_sample, ref_sample):
-        """
-        Detect if both near-end (user) and far-end (AI) are talking.
-        Uses simplified Geigel algorithm - if mic energy >> reference energy, likely double-talk.
-
-        Returns True if double-talk detected (don't adapt filter)
-        """
-        # Update Geigel window with reference samples
-        self.geigel_window[self.geigel_index] = abs(ref_sample)
-        self.geigel_index = (self.geigel_index + 1) % self.geigel_window_size
-
-        # Get max reference in recent window
-        max_ref = np.max(self.geigel_window) + self.epsilon
-
-        # If mic signal is much larger than reference, it's likely near-end speech (double-talk)
-        # Threshold: mic > 2 * max_ref means user is probably speaking
-        return abs(mic_sample) > (2.0 * max_ref)
-
-    def process(self, mic_sample, ref_sample):
-        """
-        Process one sample with RLS adaptive filtering.
-
-        Args:
-            mic_sample: Current microphone sample (desired signal + echo)
-            ref_sample: Current reference sample (speaker output)
-
-        Returns:
-            error_sample: Echo-cancelled output (estimated desired signal)
-        """
-        # Normalize inputs to prevent overflow
-        mic_sample = np.clip(mic_sample, -32768, 32767)
-        ref_sample = np.clip(ref_sample, -32768, 32767)
-
-        # Update reference buffer (shift and add new sample)
-        self.reference_buffer = np.roll(self.reference_buffer, 1)
-        self.reference_buffer[0] = ref_sample
-
-        # Predict echo using current filter weights
-        predicted_echo = np.dot(self.weights, self.reference_buffer)
-
-        # Calculate prior estimation error
-        error = mic_sample - predicted_echo
-
-        # Double-talk detection - only adapt if no double-talk
-        is_double_talk = self._detect_double_talk(mic_sample, ref_sample)
-
-        if not is_double_talk:
-            # RLS algorithm update
-            # Step 1: Compute gain vector k
-            # k = P * u / (λ + u^T * P * u)
-            P_u = np.dot(self.P, self.reference_buffer)
-            denominator = self.lambda_val + np.dot(self.reference_buffer, P_u)
-            gain_vector = P_u / (denominator + self.epsilon)
-
-            # Step 2: Update filter weights
-            # w = w + k * error
-            self.weights += gain_vector * error
-
-            # Step 3: Update inverse correlation matrix P
-            # P = (1/λ) * (P - k * u^T * P)
-            self.P = (1.0 / self.lambda_val) * (
-                self.P - np.outer(gain_vector, np.dot(self.reference_buffer, self.P))
-            )
-
-        # else: freeze adaptation during double-talk
-
-        return error
+    Best-effort priority boost for the calling audio thread.
+    Returns True on success - needs CAP_SYS_NICE / rtprio on Linux.
+    """
+    try:
+        if hasattr(os, 'sched_setscheduler'):
+            # Below the DTLN worker (FIFO 20) - this thread waits on it
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(10))
+            return True
+        if sys.platform == 'darwin':
+            import ctypes
+            QOS_CLASS_USER_INTERACTIVE = 0x21
+            libc = ctypes.CDLL('/usr/lib/libSystem.dylib')
+            return libc.pthread_set_qos_class_self_np(QOS_CLASS_USER_INTERACTIVE, 0) == 0
+        if sys.platform == 'win32':
+            import ctypes
+            THREAD_PRIORITY_HIGHEST = 2
+            kernel32 = ctypes.windll.kernel32
+            return bool(kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_HIGHEST))
+    except (OSError, AttributeError):
+        pass
+    return False
+
+
+if NUMBA_ENABLED:
+    @njit(cache=True, fastmath=True)
+    def _mean_abs_i16(samples):
+        """Mean absolute value of int16 samples - fused abs + sum, no temporary array"""
+        total = 0
+        for i in range(samples.shape[0]):
+            v = np.int32(samples[i])
+            total += -v if v < 0 else v
+        return total / samples.shape[0]
+else:
+    def _mean_abs_i16(samples):
+        """Mean absolute value of int16 samples in one pass (int32 abs, no overflow at -32768)"""
+        return np.abs(samples, dtype=np.int32).sum() / samples.size
 
 
 class VoiceChatClient:
@@ -198,7 +311,8 @@ class VoiceChatClient:
         # State
         self.is_tts_playing = False  # AI is speaking
         self.is_listening = False  # User is speaking
-        self.audio_buffer = []
+        self.audio_buffer = bytearray()  # PCM of the current utterance, extended in place
+        self._send_accum = bytearray()  # Streamed mic audio waiting to fill a WebSocket frame
         self.silence_frames = 0
         self.speech_frames = 0
         self.mic_enabled = True  # Microphone toggle
@@ -206,24 +320,77 @@ class VoiceChatClient:
         # Function calling state
         self.pending_function_calls = {}
 
-        # Queues
-        self.audio_queue = queue.Queue()
-        self.output_audio_queue = queue.Queue()  # For managing audio playback
+        # Server event dispatch (response.text.delta is deliberately ignored -
+        # printing while streaming would only clutter the console)
+        self._event_handlers = {
+            "session.created": self._handle_session_created,
+            "session.updated": self._handle_session_updated,
+            "conversation.item.created": self._handle_conversation_item_created,
+            "response.text.done": self._handle_text_done,
+            "response.audio.delta": self._handle_audio_delta,
+            "response.audio.done": self._handle_audio_done,
+            "response.cancelled": self._handle_response_cancelled,
+            "response.done": self._handle_response_done,
+            "response.function_call_arguments.delta": self._handle_function_call_arguments_delta,
+            "response.function_call_arguments.done": self._handle_function_call_arguments_done,
+            "error": self._handle_error,
+        }
+
+        # Queues (filled/drained by the PortAudio stream callbacks)
+        self.audio_queue = queue.Queue(maxsize=INPUT_QUEUE_MAX_CHUNKS)  # Captured mic frames for the listen loop
+        # For managing audio playback - bounded, the oldest audio is dropped on overflow
+        self.output_audio_queue = queue.Queue(maxsize=OUTPUT_QUEUE_MAX_CHUNKS)
+        self._playback_pending = bytearray()  # Dequeued TTS audio not yet handed to the output stream
 
         # Echo cancellation - track recent output audio for reference
-        self.echo_reference_buffer = []  # Stores recent TTS audio chunks
-        self.echo_reference_lock = threading.Lock()
+        # Ring buffer of recent TTS audio (16kHz int16): _ref_read is the oldest
+        # unread sample, _ref_avail the number of unread samples. Only the listen
+        # thread touches it; the output callback hands over chunks as they play
+        # (None marks the end of a TTS stream) through the atomic _ref_handoff deque
+        self._ref_handoff = deque(maxlen=REF_HANDOFF_MAX_CHUNKS)
         self.max_echo_delay_samples = int(INPUT_SAMPLE_RATE * 0.5)  # 500ms buffer
+        self.echo_reference_buffer = np.zeros(self.max_echo_delay_samples, dtype=np.int16) if NUMPY_ENABLED else None
+        self._ref_read = 0
+        self._ref_avail = 0
+        self._ref_scratch = np.empty(CHUNK_SIZE, dtype=np.int16) if NUMPY_ENABLED else None
+        # DTLN writes each cleaned frame straight into this int16 view
+        self._aec_out = np.empty(CHUNK_SIZE, dtype=np.int16) if NUMPY_ENABLED else None
+        # Set while the idle fast path bypasses DTLN, whose rings then hold stale audio
+        self._aec_idle = False
+
+        # 24kHz -> 16kHz polyphase anti-aliasing FIR, designed once and run as
+        # one continuous stream across TTS chunks (gain of 2 for the zero-stuffing)
+        if SCIPY_ENABLED:
+            self._resample_filter = scipy_signal.firwin(61, 1 / 3.0, window=('kaiser', 5.0)) * 2
+            self._reset_resampler()
 
         # Initialize DTLN-aec for echo cancellation
         if DTLN_ENABLED and ECHO_SUPPRESSION_ENABLED:
             # Use model size 128 for lowest latency (best for real-time)
             # Options: 128 (fastest), 256 (balanced), 512 (best quality)
-            self.dtln_aec = DTLNAECRealtime(model_size=128)
+            self.dtln_aec = None
+            if AEC_SEPARATE_PROCESS:
+                try:
+                    self.dtln_aec = DTLNAECProcess(frame_size=CHUNK_SIZE, model_size=128)
+                except (OSError, RuntimeError) as e:
+                    print(f"   ⚠️  DTLN-aec process unavailable ({e}) - running in-process")
+            if self.dtln_aec is None:
+                self.dtln_aec = DTLNAECRealtime(model_size=128)
         else:
             self.dtln_aec = None
             print("   ⚠️  Echo cancellation disabled")
 
+        # Compile the energy kernel now rather than on the first mic frame
+        if NUMBA_ENABLED:
+            _mean_abs_i16(_SILENCE_FRAME)
+
+        # Module flags resolved once, so the audio threads read attributes
+        # instead of repeated global lookups
+        self._echo_ref_on = ECHO_SUPPRESSION_ENABLED and NUMPY_ENABLED
+        self._aec_on = self._echo_ref_on and DTLN_ENABLED and self.dtln_aec is not None
+        self._resample_on = SCIPY_ENABLED
+        self._debug = DEBUG_AEC
+
         # Timing tracking for adaptive VAD threshold
         self.last_tts_chunk_time = 0
         self.tts_decay_time = 1.5  # seconds to decay threshold after TTS stops
@@ -239,13 +406,14 @@ class VoiceChatClient:
             channels=CHANNELS,
             rate=SAMPLE_RATE,
             output=True,
-            frames_per_buffer=1024
+            frames_per_buffer=1024,
+            stream_callback=self._output_callback,
+            start=False
         )
 
         # Input stream for recording user speech
         # Try to enable echo cancellation if platform supports it
         try:
-            import platform
             # Platform-specific echo cancellation
             if platform.system() == 'Darwin':  # macOS
                 # macOS uses Core Audio which has built-in echo cancellation
@@ -255,6 +423,8 @@ class VoiceChatClient:
                     rate=INPUT_SAMPLE_RATE,
                     input=True,
                     frames_per_buffer=CHUNK_SIZE,
+                    stream_callback=self._input_callback,
+                    start=False
                     # Note: PyAudio on macOS should use echo cancellation by default
                 )
             else:
@@ -264,7 +434,9 @@ class VoiceChatClient:
                     channels=CHANNELS,
                     rate=INPUT_SAMPLE_RATE,
                     input=True,
-                    frames_per_buffer=CHUNK_SIZE
+                    frames_per_buffer=CHUNK_SIZE,
+                    stream_callback=self._input_callback,
+                    start=False
                 )
         except Exception as e:
             print(f"⚠️  Could not enable echo cancellation: {e}")
@@ -273,13 +445,15 @@ class VoiceChatClient:
                 channels=CHANNELS,
                 rate=INPUT_SAMPLE_RATE,
                 input=True,
-                frames_per_buffer=CHUNK_SIZE
+                frames_per_buffer=CHUNK_SIZE,
+                stream_callback=self._input_callback,
+                start=False
             )
 
         print("✅ Audio devices ready")
         print(f"   🔊 Output: {SAMPLE_RATE}Hz")
         print(f"   🎤 Input: {INPUT_SAMPLE_RATE}Hz")
-        if ECHO_SUPPRESSION_ENABLED and DTLN_ENABLED and self.dtln_aec is not None:
+        if self._aec_on:
             print(f"   🔇 Echo cancellation: DTLN-aec (DEEP LEARNING) ⭐⭐⭐")
             print(f"   🤖 Neural network-based AEC - State of the art!")
             print(f"   🎯 Full-duplex: You can interrupt the AI anytime")
@@ -294,30 +468,53 @@ class VoiceChatClient:
 
     def on_message(self, ws, message):
         """Called when a message is received from the server."""
+        # connect() skips UTF-8 validation, so frames arrive as bytes
+        if isinstance(message, str):
+            message = message.encode()
+
+        # Fast path for the highest-rate event: pull the base64 delta out of
+        # the raw frame instead of JSON-decoding the whole payload
+        if message.startswith(_AUDIO_DELTA_PREFIX):
+            start = message.find(_DELTA_FIELD, len(_AUDIO_DELTA_PREFIX))
+            if start != -1:
+                start += len(_DELTA_FIELD)
+                end = message.find(b'"', start)
+                if end != -1:
+                    self._queue_audio_delta(message[start:end])
+                    return
+
         try:
-            event = json.loads(message)
-            event_type = event.get("type", "unknown")
-
-            # Debug: log all non-audio events
-            if DEBUG_AEC and event_type not in ["response.audio.delta", "input_audio_buffer.speech_started", "input_audio_buffer.speech_stopped"]:
-                print(f"   📨 Event: {event_type}")
-
-            if event_type == "session.created":
-                print("🎉 Session created!")
-                session = event.get("session", {})
-                print(f"   Voice: {session.get('voice')}")
-                turn_detection_type = session.get('turn_detection', {})
-                if isinstance(turn_detection_type, dict):
-                    print(f"   Turn detection: {turn_detection_type.get('type')}")
-                else:
-                    print(f"   Turn detection: {turn_detection_type}")
-                print()
+            event = json_loads(message)
+        except ValueError as e:
+            print(f"❌ Failed to parse message: {e}")
+            return
+
+        event_type = event.get("type", "unknown")
+
+        # Debug: log all non-audio events
+        if DEBUG_AEC and event_type not in _QUIET_EVENTS:
+            print(f"   📨 Event: {event_type}")
+
+        handler = self._event_handlers.get(event_type)
+        if handler:
+            handler(event)
 
-                # Update session with our preferences
-                # IMPORTANT: Explicitly disable server-side turn detection for client-side VAD
-                session_config = {
-                    "session": {
-                        "instructions": """You are an AI agent orchestrator. You manage AI agents for users.
+    def _handle_session_created(self, event):
+        print("🎉 Session created!")
+        session = event.get("session", {})
+        print(f"   Voice: {session.get('voice')}")
+        turn_detection_type = session.get('turn_detection', {})
+        if isinstance(turn_detection_type, dict):
+            print(f"   Turn detection: {turn_detection_type.get('type')}")
+        else:
+            print(f"   Turn detection: {turn_detection_type}")
+        print()
+
+        # Update session with our preferences
+        # IMPORTANT: Explicitly disable server-side turn detection for client-side VAD
+        session_config = {
+            "session": {
+                "instructions": """You are an AI agent orchestrator. You manage AI agents for users.
 
 CRITICAL: You have function tools available. You MUST use them when users ask about agents.
 
@@ -334,193 +531,213 @@ The agents YOU manage are:
 - Agent Zero agents (for general tasks)
 
 When a user asks anything about "agents", they mean the AI agents in YOUR system. Always use your function tools to manage them.""",
-                        "voice": "nova",
-                        "temperature": 0.6,
-                        "input_audio_transcription": {"model": "whisper-1"},
-                        "turn_detection": {"type": "none"}  # Disable server-side VAD
-                    }
-                }
+                "voice": "nova",
+                "temperature": 0.6,
+                "input_audio_transcription": {"model": "whisper-1"},
+                "turn_detection": {"type": "none"}  # Disable server-side VAD
+            }
+        }
 
-                # Add tools if function handlers are registered
-                if self.function_handlers:
-                    tools = self._get_tools_schema()
-                    session_config["session"]["tools"] = tools
-                    print(f"🔧 Registering {len(tools)} function tools:")
-                    for tool in tools:
-                        print(f"   - {tool['name']}")
-
-                    # Debug: show what we're sending
-                    if DEBUG_AEC:
-                        print(f"   🔍 Full session config:")
-                        print(f"      {json.dumps(session_config, indent=6)[:500]}...")
-
-                self.send_event("session.update", session_config)
-
-            elif event_type == "session.updated":
-                print("✅ Session configured")
-                updated_session = event.get("session", {})
-
-                # Debug: Check if tools were accepted by server
-                tools = updated_session.get("tools")
-                if tools:
-                    print(f"   ✅ Server confirmed {len(tools)} tools registered")
-                    # Show tool details
-                    for tool in tools:
-                        print(f"      - {tool.get('name', 'unknown')}")
-                elif self.function_handlers:
-                    print(f"   ⚠️  WARNING: We sent tools but server returned none!")
-                    print(f"   This means the backend doesn't support function calling.")
-                turn_detection = updated_session.get("turn_detection", {})
-                if isinstance(turn_detection, dict):
-                    print(f"   Turn detection updated to: {turn_detection.get('type', 'unknown')}")
-                else:
-                    print(f"   Turn detection updated to: {turn_detection}")
-                print()
-                print("=" * 60)
-                print("🎤 Ready! Start speaking...")
-                print("   Press Ctrl+C to quit")
-                print("=" * 60)
-                print()
-
-                # Start listening for user input
-                self.start_listening()
-                # Start audio playback thread
-                self.start_audio_playback()
-
-            elif event_type == "conversation.item.created":
-                item = event.get("item", {})
-                role = item.get("role", "unknown")
-                content = item.get("content", [])
-
-                if DEBUG_AEC:
-                    print(f"   📨 Conversation item - role: {role}, content items: {len(content)}")
-
-                if role == "user" and content:
-                    # Check for transcript in content
-                    for content_item in content:
-                        if content_item.get("type") == "input_audio":
-                            transcript = content_item.get("transcript")
-                            if transcript:
-                                print(f"\n👤 You: {transcript}")
-                        elif content_item.get("type") == "input_text":
-                            text = content_item.get("text", "")
-                            if text:
-                                print(f"\n👤 You: {text}")
-
-            elif event_type == "response.text.delta":
-                delta = event.get("delta", "")
-                if delta:
-                    # Don't print anything during streaming to avoid clutter
+        # Add tools if function handlers are registered
+        if self.function_handlers:
+            tools = TOOLS_SCHEMA
+            session_config["session"]["tools"] = tools
+            print(f"🔧 Registering {len(tools)} function tools:")
+            for tool in tools:
+                print(f"   - {tool['name']}")
+
+            # Debug: show what we're sending
+            if DEBUG_AEC:
+                print(f"   🔍 Full session config:")
+                print(f"      {json.dumps(session_config, indent=6)[:500]}...")
+
+        self.send_event("session.update", session_config)
+
+    def _handle_session_updated(self, event):
+        print("✅ Session configured")
+        updated_session = event.get("session", {})
+
+        # Debug: Check if tools were accepted by server
+        tools = updated_session.get("tools")
+        if tools:
+            print(f"   ✅ Server confirmed {len(tools)} tools registered")
+            # Show tool details
+            for tool in tools:
+                print(f"      - {tool.get('name', 'unknown')}")
+        elif self.function_handlers:
+            print(f"   ⚠️  WARNING: We sent tools but server returned none!")
+            print(f"   This means the backend doesn't support function calling.")
+        turn_detection = updated_session.get("turn_detection", {})
+        if isinstance(turn_detection, dict):
+            print(f"   Turn detection updated to: {turn_detection.get('type', 'unknown')}")
+        else:
+            print(f"   Turn detection updated to: {turn_detection}")
+        print()
+        print("=" * 60)
+        print("🎤 Ready! Start speaking...")
+        print("   Press Ctrl+C to quit")
+        print("=" * 60)
+        print()
+
+        # Start listening for user input
+        self.start_listening()
+        # Start audio playback thread
+        self.start_audio_playback()
+
+    def _handle_conversation_item_created(self, event):
+        item = event.get("item", {})
+        role = item.get("role", "unknown")
+        content = item.get("content", [])
+
+        if DEBUG_AEC:
+            print(f"   📨 Conversation item - role: {role}, content items: {len(content)}")
+
+        if role == "user" and content:
+            # Check for transcript in content
+            for content_item in content:
+                if content_item.get("type") == "input_audio":
+                    transcript = content_item.get("transcript")
+                    if transcript:
+                        print(f"\n👤 You: {transcript}")
+                elif content_item.get("type") == "input_text":
+                    text = content_item.get("text", "")
+                    if text:
+                        print(f"\n👤 You: {text}")
+
+    def _handle_text_done(self, event):
+        text = event.get("text", "")
+        print(f"\n🤖 AI: {text}")
+        self.is_tts_playing = True
+
+    def _handle_audio_delta(self, event):
+        self._queue_audio_delta(event.get("delta", ""))
+
+    def _queue_audio_delta(self, delta):
+        """Queue a base64 audio chunk for playback"""
+        if delta:
+            try:
+                audio_data = base64.b64decode(delta)
+                self._queue_playback(audio_data)
+                # Track audio chunks received
+                if not hasattr(self, 'audio_chunk_count'):
+                    self.audio_chunk_count = 0
+                    self.is_tts_playing = True
+                    print(f"   🔊 Starting TTS playback...")
+                self.audio_chunk_count += 1
+            except Exception as e:
+                print(f"   ❌ Error queueing audio: {e}")
+
+    def _handle_audio_done(self, event):
+        # Mark end of audio stream
+        chunks = getattr(self, 'audio_chunk_count', 0)
+        print(f"   📻 Audio stream ended by server (received {chunks} chunks)")
+        self.audio_chunk_count = 0
+        self._queue_playback(None)  # Signal end of audio
+
+    def _queue_playback(self, audio):
+        """
+        Put audio (or the None end marker) on the playback queue, dropping the oldest if full.
+        Audio is queued with its 16kHz echo reference, resampled here on the WebSocket
+        thread so the output callback only has to hand it over.
+        """
+        if audio is None:
+            item = None
+            if self._resample_on:
+                self._reset_resampler()  # Next TTS stream starts fresh
+        else:
+            item = (audio, self._resample_reference(audio) if self._aec_on else None)
+
+        while True:
+            try:
+                self.output_audio_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.output_audio_queue.get_nowait()
+                    if self._debug:
+                        print("   ⚠️  Playback queue full - dropped oldest audio chunk")
+                except queue.Empty:
                     pass
 
-            elif event_type == "response.text.done":
-                text = event.get("text", "")
-                print(f"\n🤖 AI: {text}")
-                self.is_tts_playing = True
-
-            elif event_type == "response.audio.delta":
-                # Queue audio chunk for playback
-                delta = event.get("delta", "")
-                if delta:
-                    try:
-                        audio_data = base64.b64decode(delta)
-                        self.output_audio_queue.put(audio_data)
-                        # Track audio chunks received
-                        if not hasattr(self, 'audio_chunk_count'):
-                            self.audio_chunk_count = 0
-                            self.is_tts_playing = True
-                            print(f"   🔊 Starting TTS playback...")
-                        self.audio_chunk_count += 1
-                    except Exception as e:
-                        print(f"   ❌ Error queueing audio: {e}")
-
-            elif event_type == "response.audio.done":
-                # Mark end of audio stream
-                chunks = getattr(self, 'audio_chunk_count', 0)
-                print(f"   📻 Audio stream ended by server (received {chunks} chunks)")
-                self.audio_chunk_count = 0
-                self.output_audio_queue.put(None)  # Signal end of audio
-
-            elif event_type == "response.cancelled":
-                print("   🛑 Response cancelled")
-                self.is_tts_playing = False
-
-            elif event_type == "response.done":
-                response = event.get("response", {})
-                status = response.get("status", "unknown")
-                if DEBUG_AEC:
-                    print(f"   📨 Response done - status: {status}")
-                print()
-                print("─" * 60)
-                print("🎤 Listening...")
-                print()
-
-            elif event_type == "response.function_call_arguments.delta":
-                # Function call argument streaming
-                call_id = event.get("call_id")
-                delta = event.get("delta", "")
-                if call_id:
-                    if call_id not in self.pending_function_calls:
-                        self.pending_function_calls[call_id] = {"name": "", "arguments": ""}
-                    self.pending_function_calls[call_id]["arguments"] += delta
-
-            elif event_type == "response.function_call_arguments.done":
-                # Function call complete - execute it
-                call_id = event.get("call_id")
-                name = event.get("name")
-                arguments = event.get("arguments", "{}")
-
-                print(f"\n🔧 Function call: {name}")
-                print(f"   Arguments: {arguments}")
-
-                if name in self.function_handlers:
-                    try:
-                        import json as json_lib
-                        args = json_lib.loads(arguments)
-                        result = self.function_handlers[name](**args)
-                        print(f"   ✅ Result: {result}")
-
-                        # Send function output back to server
-                        self.send_event("conversation.item.create", {
-                            "item": {
-                                "type": "function_call_output",
-                                "call_id": call_id,
-                                "output": json_lib.dumps(result)
-                            }
-                        })
-
-                        # Request response to continue conversation
-                        # After a tool is executed, let model decide (auto) what to do next
-                        self.send_event("response.create", {
-                            "response": {
-                                "modalities": ["text", "audio"],
-                                "tool_choice": "auto"
-                            }
-                        })
-
-                    except Exception as e:
-                        print(f"   ❌ Error executing function: {e}")
-                        error_result = {"ok": False, "error": str(e)}
-                        self.send_event("conversation.item.create", {
-                            "item": {
-                                "type": "function_call_output",
-                                "call_id": call_id,
-                                "output": json_lib.dumps(error_result)
-                            }
-                        })
-                else:
-                    print(f"   ⚠️  No handler registered for function: {name}")
+    def _clear_playback(self):
+        """Discard all queued and pending TTS audio in one step"""
+        q = self.output_audio_queue
+        with q.mutex:
+            q.queue.clear()
+            q.not_full.notify_all()
+        self._playback_pending.clear()
+
+    def _handle_response_cancelled(self, event):
+        print("   🛑 Response cancelled")
+        self.is_tts_playing = False
+
+    def _handle_response_done(self, event):
+        response = event.get("response", {})
+        status = response.get("status", "unknown")
+        if DEBUG_AEC:
+            print(f"   📨 Response done - status: {status}")
+        print()
+        print("─" * 60)
+        print("🎤 Listening...")
+        print()
 
-                # Clean up pending call
-                if call_id in self.pending_function_calls:
-                    del self.pending_function_calls[call_id]
+    def _handle_function_call_arguments_delta(self, event):
+        # Function call argument streaming
+        call_id = event.get("call_id")
+        delta = event.get("delta", "")
+        if call_id:
+            if call_id not in self.pending_function_calls:
+                self.pending_function_calls[call_id] = {"name": "", "arguments": ""}
+            self.pending_function_calls[call_id]["arguments"] += delta
+
+    def _handle_function_call_arguments_done(self, event):
+        # Function call complete - execute it
+        call_id = event.get("call_id")
+        name = event.get("name")
+        arguments = event.get("arguments", "{}")
+
+        print(f"\n🔧 Function call: {name}")
+        print(f"   Arguments: {arguments}")
+
+        if name in self.function_handlers:
+            try:
+                args = json_loads(arguments)
+                result = self.function_handlers[name](**args)
+                print(f"   ✅ Result: {result}")
+
+                # Send function output back to server
+                self.send_event("conversation.item.create", {
+                    "item": {
+                        "type": "function_call_output",
+                        "call_id": call_id,
+                        "output": json_dumps(result)
+                    }
+                })
 
-            elif event_type == "error":
-                error = event.get("error", {})
-                print(f"\n❌ Error: {error.get('type')} - {error.get('message')}")
+                # Request response to continue conversation
+                # After a tool is executed, let model decide (auto) what to do next
+                self.request_response()
 
-        except json.JSONDecodeError as e:
-            print(f"❌ Failed to parse message: {e}")
+            except Exception as e:
+                print(f"   ❌ Error executing function: {e}")
+                error_result = {"ok": False, "error": str(e)}
+                self.send_event("conversation.item.create", {
+                    "item": {
+                        "type": "function_call_output",
+                        "call_id": call_id,
+                        "output": json_dumps(error_result)
+                    }
+                })
+        else:
+            print(f"   ⚠️  No handler registered for function: {name}")
+
+        # Clean up pending call
+        if call_id in self.pending_function_calls:
+            del self.pending_function_calls[call_id]
+
+    def _handle_error(self, event):
+        error = event.get("error", {})
+        print(f"\n❌ Error: {error.get('type')} - {error.get('message')}")
 
     def on_error(self, ws, error):
         """Called when an error occurs."""
@@ -544,181 +761,213 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
         if event_type == "response.create" and DEBUG_AEC:
             print(f"   🔍 Sending response.create: {json.dumps(event, indent=2)}")
 
-        self.ws.send(json.dumps(event))
-
-    def _get_tools_schema(self):
-        """Get tools schema for function calling"""
-        return [
-            {
-                "type": "function",
-                "name": "create_agent",
-                "description": "Create a new AI agent (Claude Code for coding, Gemini for browser automation, or Agent Zero for general tasks)",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "tool": {
-                            "type": "string",
-                            "enum": ["claude_code", "gemini", "agent_zero"],
-                            "description": "Type of agent to create"
-                        },
-                        "agent_type": {
-                            "type": "string",
-                            "description": "Agent type (agentic_coding, agentic_browsing, agentic_general)"
-                        },
-                        "agent_name": {
-                            "type": "string",
-                            "description": "Unique name for the agent"
-                        },
-                        "lifetime_hours": {
-                            "type": "number",
-                            "description": "How many hours the agent should live (default 24)",
-                            "default": 24
-                        }
-                    },
-                    "required": ["tool", "agent_type", "agent_name"]
-                }
-            },
-            {
-                "type": "function",
-                "name": "list_agents",
-                "description": "List all active AI agents and their status",
-                "parameters": {
-                    "type": "object",
-                    "properties": {}
-                }
-            },
-            {
-                "type": "function",
-                "name": "command_agent",
-                "description": "Send a command or instruction to an existing agent",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "agent_name": {
-                            "type": "string",
-                            "description": "Name of the agent to command"
-                        },
-                        "prompt": {
-                            "type": "string",
-                            "description": "Command or instruction for the agent"
-                        }
-                    },
-                    "required": ["agent_name", "prompt"]
-                }
-            },
-            {
-                "type": "function",
-                "name": "delete_agent",
-                "description": "Delete an agent and remove it from the registry",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "agent_name": {
-                            "type": "string",
-                            "description": "Name of the agent to delete"
-                        }
-                    },
-                    "required": ["agent_name"]
-                }
-            },
-            {
-                "type": "function",
-                "name": "get_agent_status",
-                "description": "Get detailed status and metadata for an agent",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "agent_name": {
-                            "type": "string",
-                            "description": "Name of the agent to query"
-                        }
-                    },
-                    "required": ["agent_name"]
-                }
-            }
-        ]
+        self.ws.send(json_encode(event))
+
+    def request_response(self):
+        """Ask the server for a response (text + audio, tools on auto)."""
+        if not self.ws:
+            return
+        if DEBUG_AEC:
+            payload = _RESPONSE_CREATE_EVENT
+            if isinstance(payload, bytes):
+                payload = payload.decode()
+            print(f"   🔍 Sending response.create: {payload}")
+        self.ws.send(_RESPONSE_CREATE_EVENT)
+
+    def send_raw(self, payload):
+        """Send an already-serialized event (str or JSON bytes) to the server."""
+        if not self.ws:
+            return
+        self.ws.send(payload)
 
     def start_listening(self):
-        """Start listening to microphone in a separate thread."""
+        """Start microphone capture and the thread that processes it."""
         self.running = True
+        if not self.input_stream.is_active():
+            self.input_stream.start_stream()
         listen_thread = threading.Thread(target=self._listen_loop, daemon=True)
         listen_thread.start()
 
     def start_audio_playback(self):
-        """Start audio playback in a separate thread."""
-        playback_thread = threading.Thread(target=self._playback_loop, daemon=True)
-        playback_thread.start()
+        """Start the output stream - PortAudio pulls audio via _output_callback."""
+        if not self.output_stream.is_active():
+            self.output_stream.start_stream()
 
-    def _playback_loop(self):
-        """Continuous loop that plays audio from the queue."""
-        while self.running:
+    def _input_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio capture callback - hands each mic frame to the listen loop."""
+        if self.mic_enabled:
             try:
-                # Get audio chunk from queue (blocking with timeout)
-                audio_chunk = self.output_audio_queue.get(timeout=0.1)
+                self.audio_queue.put_nowait(in_data)
+            except queue.Full:
+                # Listen loop fell behind - keep latency bounded by dropping the oldest frame
+                try:
+                    self.audio_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self.audio_queue.put_nowait(in_data)
+                except queue.Full:
+                    pass
+        return None, pyaudio.paContinue
 
-                if audio_chunk is None:
-                    # End of audio stream
-                    self.is_tts_playing = False
-                    print("   🔊 Audio playback complete")
-
-                    # Clear echo reference buffer after TTS completes
-                    # This prevents stale reference data from interfering with future detections
-                    with self.echo_reference_lock:
-                        # Keep last 128ms of audio for residual echo cancellation
-                        keep_samples = int(INPUT_SAMPLE_RATE * 0.128)  # 128ms at 16kHz = ~2048 samples
-                        if len(self.echo_reference_buffer) > keep_samples:
-                            self.echo_reference_buffer = self.echo_reference_buffer[-keep_samples:]
+    def _output_callback(self, in_data, frame_count, time_info, status):
+        """PortAudio playback callback - fills one output buffer from the TTS queue."""
+        needed = frame_count * CHANNELS * 2  # int16
+        pending = self._playback_pending
+        try:
+            while len(pending) < needed:
+                try:
+                    audio_chunk = self.output_audio_queue.get_nowait()
+                except queue.Empty:
+                    break
 
+                if audio_chunk is None:
+                    self._finish_playback()
                     continue
+                audio_chunk, reference = audio_chunk
 
-                # CRITICAL: Store audio chunk for echo reference BEFORE playing it
+                # CRITICAL: Release the echo reference BEFORE playing the audio
                 # This ensures the reference buffer has the signal before it reaches the mic
-                if ECHO_SUPPRESSION_ENABLED and NUMPY_ENABLED:
-                    self._add_echo_reference(audio_chunk)
+                if reference is not None:
+                    self._ref_handoff.append(reference)
+                if self._echo_ref_on:
                     self.last_tts_chunk_time = time.time()
+                pending += audio_chunk
+        except Exception as e:
+            if self.running:
+                print(f"\n❌ Error in playback callback: {e}")
+
+        # Play buffered audio (this goes to speakers and will echo back to mic),
+        # padding with silence when the queue runs dry
+        out_data = bytes(pending[:needed])
+        del pending[:needed]
+        if len(out_data) < needed:
+            out_data += bytes(needed - len(out_data))
+        return out_data, pyaudio.paContinue
+
+    def _finish_playback(self):
+        """Handle the end-of-stream marker from the TTS queue (output callback)."""
+        # End of audio stream - the listen thread logs it and trims the reference
+        self.is_tts_playing = False
+        self._ref_handoff.append(None)
+
+    def _drain_echo_reference(self):
+        """Move echo reference chunks released by the output callback into the ring (listen thread)."""
+        handoff = self._ref_handoff
+        while handoff:
+            reference = handoff.popleft()
+            if reference is not None:
+                self._ref_ring_write(reference)
+                continue
 
-                # Play audio chunk (this goes to speakers and will echo back to mic)
-                self.output_stream.write(audio_chunk)
+            print("   🔊 Audio playback complete")
 
-            except queue.Empty:
-                continue
-            except Exception as e:
-                if self.running:
-                    print(f"\n❌ Error in playback loop: {e}")
-                break
+            # Clear echo reference buffer after TTS completes
+            # This prevents stale reference data from interfering with future detections
+            # Keep last 128ms of audio for residual echo cancellation
+            keep_samples = int(INPUT_SAMPLE_RATE * 0.128)  # 128ms at 16kHz = ~2048 samples
+            if self._ref_avail > keep_samples:
+                self._ref_skip(self._ref_avail - keep_samples)
 
-    def _add_echo_reference(self, audio_chunk):
-        """Add TTS audio chunk to echo reference buffer (resampled to mic rate)."""
+    def _resample_reference(self, audio_chunk):
+        """Resample a TTS audio chunk to the mic rate for the echo reference, or None on error."""
         try:
             # Convert bytes to numpy array
             audio_24k = np.frombuffer(audio_chunk, dtype=np.int16)
 
             # Resample from 24kHz to 16kHz using scipy for better quality
             # Ratio: 16000/24000 = 2/3
-            if SCIPY_ENABLED:
-                from scipy import signal as scipy_signal
-                # Resample using polyphase filtering for high quality
-                num_samples_16k = int(len(audio_24k) * 16000 / 24000)
-                audio_16k = scipy_signal.resample(audio_24k, num_samples_16k).astype(np.int16)
+            if self._resample_on:
+                # Resample using polyphase filtering, carrying filter state between chunks
+                audio_16k = self._resample_stream(audio_24k).astype(np.int16)
             else:
                 # Fallback: simple decimation (take every 3rd sample from pairs of 2)
                 # 24kHz -> 16kHz means keeping 2 out of every 3 samples
                 # Better approach: average pairs then decimate
                 audio_16k = audio_24k[::3]  # Simple decimation
 
-            with self.echo_reference_lock:
-                # Insert at beginning (oldest samples) since we're building a delay buffer
-                self.echo_reference_buffer.extend(audio_16k)
-
-                # Keep only recent audio (max delay window)
-                if len(self.echo_reference_buffer) > self.max_echo_delay_samples:
-                    # Remove oldest samples (from beginning)
-                    excess = len(self.echo_reference_buffer) - self.max_echo_delay_samples
-                    self.echo_reference_buffer = self.echo_reference_buffer[excess:]
+            return audio_16k
         except Exception as e:
-            if DEBUG_AEC:
+            if self._debug:
                 print(f"   ❌ Echo ref error: {e}")
-            pass
+            return None
+
+    def _reset_resampler(self):
+        """Clear the streaming resampler state (start of a new TTS stream)"""
+        # History of RESAMPLE_HISTORY input samples covers the FIR span;
+        # anything after it is a 0-2 sample remainder not yet resampled
+        self._resample_carry = np.zeros(RESAMPLE_HISTORY)
+
+    def _resample_stream(self, audio_24k):
+        """
+        Resample one 24kHz chunk to 16kHz as part of a continuous stream.
+        Input is consumed in groups of 3 samples (-> 2 output samples) so the
+        polyphase phase never drifts, and the previous samples are prepended so
+        chunk edges see real history instead of zero padding. The filter is
+        causal, adding RESAMPLE_HISTORY / 3 output samples (~0.6ms) of delay.
+        """
+        x = np.concatenate((self._resample_carry, audio_24k))
+        usable = RESAMPLE_HISTORY + (len(x) - RESAMPLE_HISTORY) // 3 * 3
+        new_out = (usable - RESAMPLE_HISTORY) // 3 * 2
+        self._resample_carry = x[usable - RESAMPLE_HISTORY:]
+        if not new_out:
+            return np.empty(0)
+
+        first = RESAMPLE_HISTORY * 2 // 3
+        y = scipy_signal.upfirdn(self._resample_filter, x[:usable], 2, 3)
+        return y[first:first + new_out]
+
+    def _ref_skip(self, count):
+        """Drop the oldest count samples from the echo reference ring (listen thread)"""
+        self._ref_read = (self._ref_read + count) % self.max_echo_delay_samples
+        self._ref_avail -= count
+
+    def _ref_ring_write(self, samples):
+        """Append samples to the echo reference ring, dropping the oldest on overflow (listen thread)"""
+        capacity = self.max_echo_delay_samples
+        if len(samples) > capacity:
+            samples = samples[-capacity:]
+        count = len(samples)
+
+        # Keep only recent audio (max delay window)
+        excess = self._ref_avail + count - capacity
+        if excess > 0:
+            self._ref_skip(excess)
+
+        write = (self._ref_read + self._ref_avail) % capacity
+        first = min(count, capacity - write)
+        self.echo_reference_buffer[write:write + first] = samples[:first]
+        self.echo_reference_buffer[:count - first] = samples[first:]
+        self._ref_avail += count
+
+    def _ref_ring_read(self, count):
+        """
+        Pop the oldest count samples from the echo reference ring, or None if short (listen thread).
+        Returns a view of a reused scratch buffer, valid until the next call.
+        """
+        if self._ref_avail < count:
+            return None
+
+        if len(self._ref_scratch) < count:
+            self._ref_scratch = np.empty(count, dtype=np.int16)
+        samples = self._ref_scratch[:count]
+
+        read = self._ref_read
+        first = min(count, self.max_echo_delay_samples - read)
+        samples[:first] = self.echo_reference_buffer[read:read + first]
+        samples[first:] = self.echo_reference_buffer[:count - first]
+        self._ref_skip(count)
+        return samples
+
+    @property
+    def is_tts_playing(self):
+        """Whether the AI is currently speaking."""
+        return self._is_tts_playing
+
+    @is_tts_playing.setter
+    def is_tts_playing(self, playing):
+        self._is_tts_playing = playing
+        self._threshold_cached = self._get_adaptive_threshold()
 
     def _get_adaptive_threshold(self):
         """Get adaptive speech detection threshold based on TTS playback state."""
@@ -728,76 +977,116 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
 
     def _suppress_echo(self, audio_chunk):
         """Apply DTLN-aec echo cancellation."""
-        if not DTLN_ENABLED or not ECHO_SUPPRESSION_ENABLED or self.dtln_aec is None:
+        if not self._aec_on:
             return audio_chunk
 
+        # Muted - nothing will be sent, so skip DTLN inference
+        if not self.mic_enabled:
+            return bytes(len(audio_chunk))
+
         try:
             chunk_len = len(audio_chunk) // 2  # bytes to samples (int16)
 
             # Get reference signal (or use silence if no playback)
-            with self.echo_reference_lock:
-                if len(self.echo_reference_buffer) >= chunk_len:
-                    # Get reference samples from buffer
-                    reference_samples = self.echo_reference_buffer[:chunk_len]
-                    self.echo_reference_buffer = self.echo_reference_buffer[chunk_len:]
-                else:
-                    # No reference - use silence
-                    reference_samples = [0] * chunk_len
+            ref_array = self._ref_ring_read(chunk_len)
+
+            # Fast path: TTS idle past the decay window and no reference signal -
+            # there is no echo to cancel, so skip DTLN inference entirely
+            if (not self.is_tts_playing
+                    and time.time() - self.last_tts_chunk_time > self.tts_decay_time
+                    and (ref_array is None or not np.any(ref_array))):
+                self._aec_idle = True
+                return audio_chunk
+
+            # Leaving idle - drop the previous TTS session's buffered tail
+            if self._aec_idle:
+                self._aec_idle = False
+                self.dtln_aec.reset()
 
             # Convert to numpy arrays
             mic_array = np.frombuffer(audio_chunk, dtype=np.int16)
-            ref_array = np.array(reference_samples, dtype=np.int16)
+
+            if ref_array is None:
+                # No reference - use silence
+                if chunk_len == CHUNK_SIZE:
+                    ref_array = _SILENCE_FRAME
+                else:
+                    ref_array = np.zeros(chunk_len, dtype=np.int16)
 
             # Process through DTLN-aec
-            cleaned_array = self.dtln_aec.process_frame(mic_array, ref_array)
+            out = self._aec_out if chunk_len <= CHUNK_SIZE else None
+            cleaned_array = self.dtln_aec.process_frame(mic_array, ref_array, out)
 
             # Debug output
-            if DEBUG_AEC and np.mean(np.abs(ref_array)) > 500:
-                orig_energy = np.mean(np.abs(mic_array))
-                clean_energy = np.mean(np.abs(cleaned_array))
-                ref_energy = np.mean(np.abs(ref_array))
-                if orig_energy > 1:
-                    suppression_db = 20 * np.log10((orig_energy + 1) / (clean_energy + 1))
-                    print(f"   🤖 DTLN: {suppression_db:.1f}dB (ref={ref_energy:.0f}, mic={orig_energy:.0f})")
+            if self._debug:
+                ref_energy = _mean_abs_i16(ref_array)
+                if ref_energy > 500:
+                    orig_energy = _mean_abs_i16(mic_array)
+                    if orig_energy > 1:
+                        clean_energy = _mean_abs_i16(cleaned_array)
+                        suppression_db = 20 * math.log10((orig_energy + 1) / (clean_energy + 1))
+                        print(f"   🤖 DTLN: {suppression_db:.1f}dB (ref={ref_energy:.0f}, mic={orig_energy:.0f})")
 
             return cleaned_array.tobytes()
 
         except Exception as e:
-            if DEBUG_AEC:
+            if self._debug:
                 print(f"   ❌ DTLN error: {e}")
-                import traceback
                 traceback.print_exc()
             return audio_chunk
 
     def _listen_loop(self):
         """Continuous loop that streams microphone audio to server."""
         print("🎤 Microphone active - streaming to server...")
+        if not _raise_thread_priority():
+            print("   ⚠️  Could not raise listen thread priority (running at normal priority)")
 
+        debug = self._debug
+        aec_on = self._aec_on
+        chunk_duration = CHUNK_SIZE / INPUT_SAMPLE_RATE
+        was_muted = False
         chunk_count = 0
         while self.running:
             try:
-                # Read audio chunk from microphone
-                audio_chunk = self.input_stream.read(CHUNK_SIZE, exception_on_overflow=False)
+                # Pick up echo reference released by the output callback
+                if self._ref_handoff:
+                    self._drain_echo_reference()
 
-                # Skip processing if mic is disabled
+                # Skip capture and processing entirely while the mic is disabled
                 if not self.mic_enabled:
                     # Reset speech detection state when mic is disabled
                     if self.is_listening:
                         self.is_listening = False
-                        self.audio_buffer = []
+                        self.audio_buffer.clear()
                         self.silence_frames = 0
                         self.speech_frames = 0
                         print("\n🔇 Microphone muted - stopping recording")
+                    if self._send_accum:
+                        self._flush_audio_send()
+                    was_muted = True
+                    time.sleep(chunk_duration)
+                    continue
+
+                if was_muted:
+                    # Drop audio captured around the moment of muting
+                    was_muted = False
+                    while not self.audio_queue.empty():
+                        self.audio_queue.get_nowait()
+
+                # Wait for the next audio chunk from the capture callback
+                try:
+                    audio_chunk = self.audio_queue.get(timeout=0.1)
+                except queue.Empty:
                     continue
 
                 chunk_count += 1
-                if DEBUG_AEC and chunk_count % 50 == 0:  # Every 50 chunks (~1.5 seconds)
+                if debug and chunk_count % 50 == 0:  # Every 50 chunks (~1.5 seconds)
                     print(f"   📡 Received {chunk_count} audio chunks from microphone")
 
                 # Apply echo suppression first
-                if ECHO_SUPPRESSION_ENABLED and NUMPY_ENABLED:
+                if aec_on:
                     audio_chunk = self._suppress_echo(audio_chunk)
-                    if DEBUG_AEC and chunk_count % 50 == 0:
+                    if debug and chunk_count % 50 == 0:
                         print(f"   ✅ Echo suppression complete")
 
                 # Stream directly to server for server-side VAD
@@ -807,7 +1096,7 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
                     # Client-side VAD mode with adaptive threshold
                     is_speech = self._is_speech(audio_chunk)
 
-                    if DEBUG_AEC and is_speech:
+                    if debug and is_speech:
                         print(f"   ✅ SPEECH DETECTED! is_listening={self.is_listening}, speech_frames={self.speech_frames}")
 
                     if is_speech:
@@ -816,7 +1105,7 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
 
                         if not self.is_listening:
                             self.is_listening = True
-                            self.audio_buffer = []
+                            self.audio_buffer.clear()
                             print("\n🔴 Recording...", flush=True)
 
                             # INTERRUPTION: Stop TTS playback when user starts speaking
@@ -825,30 +1114,26 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
                                 # Send response.cancel to stop the AI
                                 self.send_event("response.cancel")
                                 # Clear the audio queue to stop playback immediately
-                                while not self.output_audio_queue.empty():
-                                    try:
-                                        self.output_audio_queue.get_nowait()
-                                    except:
-                                        break
+                                self._clear_playback()
                                 self.is_tts_playing = False
 
                         if self.is_listening:
-                            self.audio_buffer.append(audio_chunk)
+                            self.audio_buffer.extend(audio_chunk)
                     else:
                         self.silence_frames += 1
                         self.speech_frames = 0
 
-                        if DEBUG_AEC and self.is_listening:
+                        if debug and self.is_listening:
                             print(f"   🔇 Silence frame {self.silence_frames}/15")
 
                         if self.is_listening:
-                            self.audio_buffer.append(audio_chunk)
+                            self.audio_buffer.extend(audio_chunk)
 
                         if self.is_listening and self.silence_frames > 15:
                             self.is_listening = False
-                            print(f"\n⏸️  Processing... (collected {len(self.audio_buffer)} chunks)", flush=True)
+                            print(f"\n⏸️  Processing... (collected {len(self.audio_buffer) // (CHUNK_SIZE * 2)} chunks)", flush=True)
                             self._send_audio_buffer()
-                            self.audio_buffer = []
+                            self.audio_buffer.clear()
 
             except Exception as e:
                 if self.running:
@@ -857,18 +1142,20 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
 
     def _is_speech(self, audio_chunk):
         """Detect if audio chunk contains speech with adaptive threshold."""
-        # Get adaptive threshold based on TTS playback state
-        adaptive_threshold = self._get_adaptive_threshold()
+        # Adaptive threshold for the current TTS playback state (recomputed on change)
+        adaptive_threshold = self._threshold_cached
 
-        # Calculate energy for all paths
-        import array
-        audio_data = array.array('h', audio_chunk)
-        energy = sum(abs(x) for x in audio_data) / len(audio_data)
+        # Calculate energy for all paths (mean absolute amplitude)
+        if NUMPY_ENABLED:
+            energy = _mean_abs_i16(np.frombuffer(audio_chunk, dtype=np.int16))
+        else:
+            audio_data = array.array('h', audio_chunk)
+            energy = sum(abs(x) for x in audio_data) / len(audio_data)
 
         # Primary detection: energy-based (DTLN-aec handles echo, so we trust energy levels)
         is_speech_energy = energy > adaptive_threshold
 
-        if DEBUG_AEC and energy > 10:
+        if self._debug and energy > 10:
             print(f"   🎤 Energy: {energy:.0f}, Threshold: {adaptive_threshold:.0f}, Speech: {is_speech_energy}, TTS: {self.is_tts_playing}")
 
         # Use energy-based detection as primary (since DTLN-aec cleans audio)
@@ -876,46 +1163,48 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
 
     def _send_audio_chunk(self, audio_chunk):
         """Send a single audio chunk to server for server-side VAD."""
-        # Encode to base64
-        audio_b64 = base64.b64encode(audio_chunk).decode()
-
-        # Send audio via input_audio_buffer.append
         # Note: isTTSPlaying state is managed via response events (response.audio.delta, response.done)
         # The server tracks this based on the response lifecycle
-        self.send_event("input_audio_buffer.append", {
-            "audio": audio_b64
-        })
+        # Coalesce a few mic frames per WebSocket frame to cut per-frame overhead
+        self._send_accum.extend(audio_chunk)
+        if len(self._send_accum) >= SEND_COALESCE_BYTES:
+            self._flush_audio_send()
+
+    def _flush_audio_send(self):
+        """Send any coalesced mic audio not yet sent."""
+        if self._send_accum:
+            self._send_audio_append(self._send_accum)
+            self._send_accum.clear()
+
+    def _send_audio_append(self, audio_data):
+        """Send an input_audio_buffer.append event for raw PCM bytes."""
+        if not self.ws:
+            return
+
+        # base64 never needs JSON escaping, so the event is assembled as bytes
+        # around the encoded audio - no dict, no str decode, no serializer pass
+        self.ws.send(_AUDIO_APPEND_PREFIX + base64.b64encode(audio_data) + _AUDIO_APPEND_SUFFIX)
 
     def _send_audio_buffer(self):
         """Send accumulated audio buffer to server (fallback mode)."""
         if not self.audio_buffer:
             return
 
-        # Combine all chunks
-        audio_data = b''.join(self.audio_buffer)
+        # All chunks are already contiguous - base64 reads the bytearray directly
+        audio_data = self.audio_buffer
 
         if DEBUG_AEC:
             print(f"   📤 Sending {len(audio_data)} bytes of audio")
 
-        # Encode to base64
-        audio_b64 = base64.b64encode(audio_data).decode()
-
         # Send audio via input_audio_buffer.append
-        self.send_event("input_audio_buffer.append", {
-            "audio": audio_b64
-        })
+        self._send_audio_append(audio_data)
 
         # Commit the buffer (triggers transcription and response)
-        self.send_event("input_audio_buffer.commit")
+        if self.ws:
+            self.ws.send(_AUDIO_COMMIT_EVENT)
 
         # Request a new response with tool usage enabled
-        # Use "auto" to let the model decide when to use tools
-        self.send_event("response.create", {
-            "response": {
-                "modalities": ["text", "audio"],
-                "tool_choice": "auto"
-            }
-        })
+        self.request_response()
 
         if DEBUG_AEC:
             print(f"   ✅ Audio sent, waiting for response...")
@@ -951,6 +1240,10 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
         self.running = False
 
         if self.ws:
+            try:
+                self._flush_audio_send()
+            except Exception:
+                pass  # Socket already gone - nothing left to deliver to
             self.ws.close()
 
         if self.input_stream:
@@ -964,6 +1257,11 @@ When a user asks anything about "agents", they mean the AI agents in YOUR system
         if self.pyaudio_instance:
             self.pyaudio_instance.terminate()
 
+        # Stop the DTLN-aec worker process (the in-process variant has nothing to close)
+        aec_close = getattr(self.dtln_aec, 'close', None)
+        if aec_close:
+            aec_close()
+
         print("👋 Goodbye!")
 
 
@@ -986,7 +1284,6 @@ def main():
         sys.exit(0)
     except Exception as e:
         print(f"\n❌ Error: {e}")
-        import traceback
         traceback.print_exc()
         sys.exit(1)
 
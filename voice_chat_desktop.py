@@ -6,25 +6,87 @@ This combines the voice_chat_client.py with a beautiful web UI using Eel.
 """
 
 import eel
+import json
+import logging
+import logging.handlers
 import threading
+import time
 import sys
 import os
+from collections import deque
+from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file (before voice_chat_client reads them).
+# DTLN-aec worker processes are spawned and re-import this file as __mp_main__ -
+# they must not repeat the app's startup side effects
+if __name__ == "__main__":
+    load_dotenv()
 
-from voice_chat_client import VoiceChatClient, BACKEND_URL, API_KEY
+from voice_chat_client import VoiceChatClient, BACKEND_URL, API_KEY, json_loads, json_encode
 from agent_manager import AgentManager
 
+# Agent workspace, resolved once at startup
+WORKSPACE_DIR = Path.cwd() / "workspace"
+
 # Global client instance
 client = None
 client_thread = None
 agent_manager = None
-
-# Initialize Eel
-eel.init('web')
+function_handlers = None  # Agent tools for function calling, built once in main()
+
+# Assistant typing deltas are batched and pushed to the UI at most this often
+TYPING_FLUSH_INTERVAL = 0.05  # seconds
+
+class _TypingState:
+    """Typing-indicator batching state, touched on every text delta"""
+    __slots__ = ("lock", "pending", "last_flush", "timer")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = []  # Deltas not yet sent to the UI
+        self.last_flush = 0.0
+        self.timer = None  # Pending trailing flush
+
+typing_state = _TypingState()
+
+# Agent list pushes to the UI are debounced so bursts of changes send one snapshot
+AGENT_LIST_BROADCAST_DELAY = 0.1  # seconds
+agent_list_lock = threading.Lock()
+agent_list_timer = None
+
+# Status pings from realtime events; a UI thread applies the newest once per tick
+STATUS_PUMP_INTERVAL = 0.05  # seconds
+status_pings = deque(maxlen=1)  # Only the latest status matters
+
+# (agent_name, operator_file) -> operator file path, for UI polling
+operator_path_cache = {}
+# operator file path -> ((mtime_ns, size), content, is_complete) from the last read
+operator_content_cache = {}
+
+# Browser console lines and UI errors are buffered and written in batches,
+# so verbose logging doesn't cost a stdout write per line
+LOG_FLUSH_INTERVAL = 0.2  # seconds
+logger = logging.getLogger("voice_chat")
+
+def _setup_logging():
+    """Attach the buffered stdout handler and start its flush thread (called from main())"""
+    log_handler = logging.handlers.MemoryHandler(
+        capacity=256,
+        flushLevel=logging.ERROR,
+        target=logging.StreamHandler(sys.stdout),
+    )
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(log_handler)
+    logger.propagate = False
+
+    def flush_periodically():
+        while True:
+            time.sleep(LOG_FLUSH_INTERVAL)
+            log_handler.flush()
+
+    threading.Thread(target=flush_periodically, daemon=True).start()
 
 @eel.expose
 def get_config():
@@ -37,43 +99,202 @@ def get_config():
 @eel.expose
 def log_to_server(level, message, data=None):
     """Receive console logs from browser and print them to server terminal"""
-    import json
-    timestamp = __import__('datetime').datetime.now().strftime('%H:%M:%S.%f')[:-3]
+    now = time.time()
+    timestamp = f"{time.strftime('%H:%M:%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
 
     # Format the log message
     if data:
         try:
             data_str = json.dumps(data, indent=2)
-            print(f"[{timestamp}] [{level.upper()}] {message}")
-            print(f"  Data: {data_str}")
+            logger.info(f"[{timestamp}] [{level.upper()}] {message}\n  Data: {data_str}")
         except:
-            print(f"[{timestamp}] [{level.upper()}] {message} | Data: {data}")
+            logger.info(f"[{timestamp}] [{level.upper()}] {message} | Data: {data}")
     else:
-        print(f"[{timestamp}] [{level.upper()}] {message}")
+        logger.info(f"[{timestamp}] [{level.upper()}] {message}")
+
+def _set_status(text, active):
+    """Update the UI status line, skipping calls that would not change it"""
+    if (text, active) == _set_status.last:
+        return
+    _set_status.last = (text, active)
+    eel.update_status(text, active)
+
+_set_status.last = (None, None)
+
+def _status_pump():
+    """Apply queued status pings off the WebSocket thread, at most once per tick"""
+    while True:
+        time.sleep(STATUS_PUMP_INTERVAL)
+        try:
+            text, active = status_pings.pop()
+        except IndexError:
+            continue
+        if client is not None:  # Don't overwrite "Stopped" with a late ping
+            _set_status(text, active)
+
+# ------------------------------------------------------------------ #
+# Realtime event -> UI updates (dispatched from on_message_with_ui)
+# ------------------------------------------------------------------ #
+
+def _ui_item_created(event):
+    item = event.get("item", {})
+    role = item.get("role", "unknown")
+    content = item.get("content", [])
+
+    if role == "user" and content:
+        for content_item in content:
+            if content_item.get("type") == "input_audio":
+                transcript = content_item.get("transcript")
+                if transcript:
+                    eel.add_user_message(transcript)
+            elif content_item.get("type") == "input_text":
+                text = content_item.get("text", "")
+                if text:
+                    eel.add_user_message(text)
+
+def _flush_typing():
+    """Send the batched typing deltas to the UI in one call"""
+    # The UI call stays under the lock so a text.done can't slip in between
+    # and leave this append behind as a stale typing bubble
+    with typing_state.lock:
+        typing_state.timer = None
+        if not typing_state.pending:
+            return
+        text = "".join(typing_state.pending)
+        typing_state.pending.clear()
+        typing_state.last_flush = time.monotonic()
+        eel.append_assistant_typing(text)
+
+def _ui_text_delta(event):
+    _queue_typing(event.get("delta", ""))
+
+def _queue_typing(delta):
+    if not delta:
+        return
+
+    # Update typing indicator (the UI appends, so only new text crosses the bridge),
+    # throttled - deltas inside the interval ride along with a trailing flush
+    with typing_state.lock:
+        typing_state.pending.append(delta)
+        if typing_state.timer is not None:
+            return
+        wait = typing_state.last_flush + TYPING_FLUSH_INTERVAL - time.monotonic()
+        if wait > 0:
+            typing_state.timer = threading.Timer(wait, _flush_typing)
+            typing_state.timer.daemon = True
+            typing_state.timer.start()
+            return
+
+    _flush_typing()
+
+def _ui_text_done(event):
+    # The final message replaces the typing bubble, so unsent deltas are dropped
+    with typing_state.lock:
+        if typing_state.timer is not None:
+            typing_state.timer.cancel()
+            typing_state.timer = None
+        typing_state.pending.clear()
+
+        text = event.get("text", "")
+        if text:
+            eel.add_assistant_message(text)
+
+def _ui_audio_delta(event):
+    status_pings.append(("AI speaking...", True))
+
+def _ui_listening(event):
+    status_pings.append(("Listening...", True))
+
+def _ui_session_created(event):
+    status_pings.append(("Connected", True))
+
+_UI_EVENT_HANDLERS = {
+    "conversation.item.created": _ui_item_created,
+    "response.text.delta": _ui_text_delta,
+    "response.text.done": _ui_text_done,
+    "response.audio.delta": _ui_audio_delta,
+    "response.audio.done": _ui_listening,
+    "response.done": _ui_listening,
+    "session.created": _ui_session_created,
+}
+_UI_EVENT_TYPES = frozenset(_UI_EVENT_HANDLERS)
+
+def _peek_event_type(message):
+    """Read the event type from the raw frame, or None unless it is the frame's first key"""
+    # Only a leading key is known to be top-level - nested items carry their own "type"
+    if not message.startswith(b'{"type":"'):
+        return None
+    start = len(b'{"type":"')
+    end = message.find(b'"', start)
+    return message[start:end].decode() if end >= 0 else None
+
+def _find_json_string_end(message, start):
+    """Index of the unescaped quote closing the JSON string that starts at start, or -1"""
+    end = message.find(b'"', start)
+    while end >= 0:
+        # A quote preceded by an odd run of backslashes is escaped
+        i = end - 1
+        while i >= start and message[i] == 0x5C:  # backslash
+            i -= 1
+        if (end - 1 - i) % 2 == 0:
+            return end
+        end = message.find(b'"', end + 1)
+    return -1
+
+# ---- Raw-frame handlers for the high-rate deltas (no full JSON decode) ---- #
+
+def _ui_text_delta_raw(message):
+    start = message.find(b'"delta":"')
+    end = _find_json_string_end(message, start + len(b'"delta":"')) if start >= 0 else -1
+    if end < 0:
+        _ui_text_delta(json_loads(message))
+        return
+
+    delta = message[start + len(b'"delta":"'):end]
+    if b'\\' in delta:
+        delta = json_loads(b'"' + delta + b'"')  # Unescape just the delta string
+    else:
+        delta = delta.decode("utf-8")
+    _queue_typing(delta)
+
+def _ui_audio_delta_raw(message):
+    _ui_audio_delta(None)  # Only a status ping - the audio payload is never read here
+
+_UI_RAW_HANDLERS = {
+    "response.text.delta": _ui_text_delta_raw,
+    "response.audio.delta": _ui_audio_delta_raw,
+}
+
+def _dispatch_ui_event(message):
+    """Update the UI for one raw server frame (bytes)"""
+    # Don't decode frames the UI has no handler for
+    event_type = _peek_event_type(message)
+    raw_handler = _UI_RAW_HANDLERS.get(event_type)
+    if raw_handler is not None:
+        raw_handler(message)
+    elif event_type is None or event_type in _UI_EVENT_TYPES:
+        event = json_loads(message)  # orjson when installed
+
+        # Update UI based on events
+        handler = _UI_EVENT_HANDLERS.get(event.get("type", "unknown"))
+        if handler is not None:
+            handler(event)
 
 @eel.expose
 def start_voice_chat(mic_enabled=True):
     """Start the voice chat client"""
-    global client, client_thread, agent_manager
+    global client, client_thread
 
     if client is not None:
         print("Voice chat already running")
         return
 
     print("🎤 Starting voice chat client...")
+    _set_status.last = (None, None)  # The UI set its own status on the button press
 
-    # Agent manager is already initialized in main()
+    # Agent manager and its function handlers are already initialized in main()
     # No need to initialize here anymore
 
-    # Create function handlers for agent management
-    function_handlers = {
-        "create_agent": agent_manager.create_agent,
-        "list_agents": lambda: agent_manager.list_agents(),
-        "command_agent": agent_manager.command_agent,
-        "delete_agent": agent_manager.delete_agent,
-        "get_agent_status": agent_manager.get_agent_status,
-    }
-
     # Create client with custom callbacks for UI updates
     client = VoiceChatClient(BACKEND_URL, API_KEY, function_handlers=function_handlers)
     # Set initial mic state from UI
@@ -86,58 +307,14 @@ def start_voice_chat(mic_enabled=True):
 
     def on_message_with_ui(ws, message):
         """Intercept messages to update UI"""
-        import json
+        # Frames arrive as bytes (the client skips UTF-8 validation)
+        if isinstance(message, str):
+            message = message.encode()
 
         try:
-            event = json.loads(message)
-            event_type = event.get("type", "unknown")
-
-            # Update UI based on events
-            if event_type == "conversation.item.created":
-                item = event.get("item", {})
-                role = item.get("role", "unknown")
-                content = item.get("content", [])
-
-                if role == "user" and content:
-                    for content_item in content:
-                        if content_item.get("type") == "input_audio":
-                            transcript = content_item.get("transcript")
-                            if transcript:
-                                eel.add_user_message(transcript)
-                        elif content_item.get("type") == "input_text":
-                            text = content_item.get("text", "")
-                            if text:
-                                eel.add_user_message(text)
-
-            elif event_type == "response.text.delta":
-                delta = event.get("delta", "")
-                if delta:
-                    # Update typing indicator
-                    if not hasattr(on_message_with_ui, 'assistant_text'):
-                        on_message_with_ui.assistant_text = ""
-                    on_message_with_ui.assistant_text += delta
-                    eel.set_assistant_typing(on_message_with_ui.assistant_text)
-
-            elif event_type == "response.text.done":
-                text = event.get("text", "")
-                if text:
-                    eel.add_assistant_message(text)
-                    on_message_with_ui.assistant_text = ""
-
-            elif event_type == "response.audio.delta":
-                eel.update_status("AI speaking...", True)
-
-            elif event_type == "response.audio.done":
-                eel.update_status("Listening...", True)
-
-            elif event_type == "response.done":
-                eel.update_status("Listening...", True)
-
-            elif event_type == "session.created":
-                eel.update_status("Connected", True)
-
+            _dispatch_ui_event(message)
         except Exception as e:
-            print(f"Error updating UI: {e}")
+            logger.warning(f"Error updating UI: {e}")
 
         # Call original handler
         original_on_message(ws, message)
@@ -150,13 +327,13 @@ def start_voice_chat(mic_enabled=True):
             client.connect()
         except Exception as e:
             print(f"Error running client: {e}")
-            eel.update_status(f"Error: {e}", False)
+            _set_status(f"Error: {e}", False)
             eel.enable_controls(True)
 
     client_thread = threading.Thread(target=run_client, daemon=True)
     client_thread.start()
 
-    eel.update_status("Connecting...", True)
+    _set_status("Connecting...", True)
 
 @eel.expose
 def stop_voice_chat():
@@ -168,14 +345,16 @@ def stop_voice_chat():
         return
 
     print("🛑 Stopping voice chat client...")
+    status_pings.clear()
+    _set_status.last = (None, None)  # The UI set its own status on the button press
 
     try:
         client.close()
         client = None
-        eel.update_status("Stopped", False)
+        _set_status("Stopped", False)
     except Exception as e:
         print(f"Error stopping client: {e}")
-        eel.update_status(f"Error: {e}", False)
+        _set_status(f"Error: {e}", False)
 
 @eel.expose
 def send_text_message(text):
@@ -184,14 +363,16 @@ def send_text_message(text):
 
     if client is None:
         print("Voice chat not running - cannot send text message")
-        eel.update_status("Not connected", False)
+        _set_status("Not connected", False)
         return
 
     print(f"📤 Sending text message: {text}")
 
     try:
-        # Send text message as a conversation item
-        client.send_event("conversation.item.create", {
+        # Serialize the item up front, then send it and the
+        # pre-encoded response request back to back
+        item_event = json_encode({
+            "type": "conversation.item.create",
             "item": {
                 "type": "message",
                 "role": "user",
@@ -204,18 +385,12 @@ def send_text_message(text):
             }
         })
 
-        # Request a response with tool usage enabled
-        # Use "auto" to let the model decide when to use tools
-        client.send_event("response.create", {
-            "response": {
-                "modalities": ["text", "audio"],
-                "tool_choice": "auto"
-            }
-        })
+        client.send_raw(item_event)
+        client.request_response()
 
     except Exception as e:
         print(f"Error sending text message: {e}")
-        eel.update_status(f"Error: {e}", False)
+        _set_status(f"Error: {e}", False)
 
 @eel.expose
 def toggle_microphone(enabled):
@@ -229,11 +404,11 @@ def toggle_microphone(enabled):
     if enabled:
         print("🎤 Microphone enabled")
         client.mic_enabled = True
-        eel.update_status("Listening...", True)
+        _set_status("Listening...", True)
     else:
         print("🔇 Microphone muted")
         client.mic_enabled = False
-        eel.update_status("Mic muted", True)
+        _set_status("Mic muted", True)
 
 @eel.expose
 def clear_conversation():
@@ -244,28 +419,43 @@ def clear_conversation():
 # Agent Management Functions (exposed to UI)
 # ------------------------------------------------------------------ #
 
+def _broadcast_agent_list():
+    """Push the current agent list to the UI"""
+    global agent_list_timer
+
+    with agent_list_lock:
+        agent_list_timer = None
+    eel.update_agent_list(agent_manager.list_agents())
+
+def _schedule_agent_list_broadcast():
+    """Broadcast the agent list shortly, restarting the delay on every change"""
+    global agent_list_timer
+
+    with agent_list_lock:
+        if agent_list_timer is not None:
+            agent_list_timer.cancel()
+        agent_list_timer = threading.Timer(AGENT_LIST_BROADCAST_DELAY, _broadcast_agent_list)
+        agent_list_timer.daemon = True
+        agent_list_timer.start()
+
 @eel.expose
 def ui_create_agent(tool, agent_type, agent_name, lifetime_hours=24):
     """Create agent from UI"""
-    global agent_manager
-
+    # main() owns the single AgentManager - never build a second one on this workspace
     if agent_manager is None:
-        workspace_dir = Path.cwd() / "workspace"
-        agent_manager = AgentManager(working_dir=str(workspace_dir))
+        return {"ok": False, "error": "Agent manager not initialized"}
 
     result = agent_manager.create_agent(tool, agent_type, agent_name, lifetime_hours)
 
     # Broadcast agent list update to UI
     if result.get("ok"):
-        eel.update_agent_list(agent_manager.list_agents())
+        _schedule_agent_list_broadcast()
 
     return result
 
 @eel.expose
 def ui_list_agents():
     """List all agents from UI"""
-    global agent_manager
-
     if agent_manager is None:
         return {"ok": True, "agents": [], "count": 0}
 
@@ -274,8 +464,6 @@ def ui_list_agents():
 @eel.expose
 def ui_command_agent(agent_name, prompt):
     """Send command to agent from UI"""
-    global agent_manager
-
     if agent_manager is None:
         return {"ok": False, "error": "Agent manager not initialized"}
 
@@ -286,8 +474,8 @@ def ui_command_agent(agent_name, prompt):
         eel.add_observability_event({
             "type": "agent_command",
             "agent_name": agent_name,
-            "prompt": prompt[:100] + "..." if len(prompt) > 100 else prompt,
-            "timestamp": __import__('datetime').datetime.now().isoformat()
+            "prompt": prompt if len(prompt) <= 100 else f"{prompt[:100]}...",
+            "timestamp": datetime.now().isoformat()
         })
 
     return result
@@ -295,67 +483,108 @@ def ui_command_agent(agent_name, prompt):
 @eel.expose
 def ui_delete_agent(agent_name):
     """Delete agent from UI"""
-    global agent_manager
-
     if agent_manager is None:
         return {"ok": False, "error": "Agent manager not initialized"}
 
     result = agent_manager.delete_agent(agent_name)
 
+    # Forget cached operator files for the deleted agent
+    for cache_key in [key for key in operator_path_cache if key[0] == agent_name]:
+        operator_content_cache.pop(operator_path_cache.pop(cache_key), None)
+
     # Broadcast agent list update to UI
     if result.get("ok"):
-        eel.update_agent_list(agent_manager.list_agents())
+        _schedule_agent_list_broadcast()
 
     return result
 
 @eel.expose
 def ui_get_agent_status(agent_name):
     """Get agent status from UI"""
-    global agent_manager
-
     if agent_manager is None:
         return {"ok": False, "error": "Agent manager not initialized"}
 
     return agent_manager.get_agent_status(agent_name)
 
+def _operator_task_complete(content):
+    """True once a "## Result" section exists and its first lines aren't the "Processing..." placeholder"""
+    start = content.find("## Result")
+    if start < 0:
+        return False
+    start += len("## Result")
+    section_end = content.find("## Result", start)
+    if section_end < 0:
+        section_end = len(content)
+
+    # The header line's remainder plus the next two lines
+    for _ in range(3):
+        line_end = content.find("\n", start, section_end)
+        if line_end < 0:
+            return content[start:section_end] != "Processing..."
+        if content[start:line_end] == "Processing...":
+            return False
+        start = line_end + 1
+    return True
+
 @eel.expose
 def ui_get_operator_file(agent_name, operator_file):
     """Get operator file contents for polling updates"""
-    global agent_manager
-
     if agent_manager is None:
         return {"ok": False, "error": "Agent manager not initialized"}
 
     try:
-        # Get agent metadata to find the correct directory
-        status = agent_manager.get_agent_status(agent_name)
-        if not status.get("ok"):
-            return status
-
-        # Extract tool from status response
-        tool = status.get("tool")
-        if not tool:
-            return {"ok": False, "error": "Agent tool not found"}
-
-        # Build path to operator file
-        from pathlib import Path
-        agent_dir = Path(agent_manager.working_dir) / "agents" / tool / agent_name
-        operator_path = agent_dir / operator_file
-
-        if not operator_path.exists():
-            return {"ok": False, "error": f"Operator file not found: {operator_file}"}
-
-        # Read and return contents
-        content = operator_path.read_text(encoding="utf-8")
-
-        # Check if task is complete by looking for "## Result" section
-        is_complete = "## Result" in content and "Processing..." not in content.split("## Result")[1].split("\n")[0:3]
+        # Resolved paths are cached across polls - re-resolve if the file went away
+        # (agent deleted or recreated under another tool)
+        cache_key = (agent_name, operator_file)
+        operator_path = operator_path_cache.get(cache_key)
+        try:
+            stat = operator_path.stat() if operator_path is not None else None
+        except FileNotFoundError:
+            stat = None
+
+        if stat is None:
+            operator_path_cache.pop(cache_key, None)
+
+            # Get agent metadata to find the correct directory
+            status = agent_manager.get_agent_status(agent_name)
+            if not status.get("ok"):
+                return status
+
+            # Extract tool from status response
+            tool = status.get("tool")
+            if not tool:
+                return {"ok": False, "error": "Agent tool not found"}
+
+            # Build path to operator file
+            agent_dir = Path(agent_manager.working_dir) / "agents" / tool / agent_name
+            operator_path = agent_dir / operator_file
+
+            try:
+                stat = operator_path.stat()
+            except FileNotFoundError:
+                return {"ok": False, "error": f"Operator file not found: {operator_file}"}
+            operator_path_cache[cache_key] = operator_path
+
+        # Only re-read the file when it changed since the last poll
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = operator_content_cache.get(operator_path)
+        unchanged = cached is not None and cached[0] == signature
+        if unchanged:
+            _, content, is_complete = cached
+        else:
+            # Read and return contents
+            content = operator_path.read_text(encoding="utf-8")
+
+            # Check if task is complete by looking for "## Result" section
+            is_complete = _operator_task_complete(content)
+            operator_content_cache[operator_path] = (signature, content, is_complete)
 
         return {
             "ok": True,
             "content": content,
             "is_complete": is_complete,
-            "operator_file": operator_file
+            "operator_file": operator_file,
+            "unchanged": unchanged
         }
 
     except Exception as e:
@@ -363,7 +592,7 @@ def ui_get_operator_file(agent_name, operator_file):
 
 def main():
     """Main entry point"""
-    global agent_manager
+    global agent_manager, function_handlers
 
     print("=" * 60)
     print("🎙️ Voice Chat Desktop App with DTLN-aec")
@@ -372,10 +601,25 @@ def main():
     print("Starting web server...")
     print()
 
+    # Initialize Eel
+    eel.init('web')
+
     # Initialize agent manager at startup
-    workspace_dir = Path.cwd() / "workspace"
-    agent_manager = AgentManager(working_dir=str(workspace_dir))
-    print(f"🤖 Agent manager initialized: {workspace_dir}")
+    agent_manager = AgentManager(working_dir=str(WORKSPACE_DIR))
+    print(f"🤖 Agent manager initialized: {WORKSPACE_DIR}")
+
+    # Function handlers for agent management (reused across start/stop cycles)
+    function_handlers = {
+        "create_agent": agent_manager.create_agent,
+        "list_agents": agent_manager.list_agents,
+        "command_agent": agent_manager.command_agent,
+        "delete_agent": agent_manager.delete_agent,
+        "get_agent_status": agent_manager.get_agent_status,
+    }
+
+    # Realtime status pings and buffered log lines are handled off the hot paths
+    threading.Thread(target=_status_pump, daemon=True).start()
+    _setup_logging()
 
     # Load existing agents
     agents = agent_manager.list_agents()
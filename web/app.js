@@ -96,6 +96,12 @@ function set_assistant_typing(text) {
   renderMessages();
 }
 
+eel.expose(append_assistant_typing);
+function append_assistant_typing(delta) {
+  typingAssistant += delta || "";
+  renderMessages();
+}
+
 eel.expose(update_status);
 function update_status(text, active) {
   setStatus(text, active);